@@ -6,6 +6,7 @@ import structlog
 
 from src.log_setup import setup_logging
 from src.market import start_market_session
+from src.tracing import setup_tracing
 
 log = structlog.get_logger(__name__)
 
@@ -14,6 +15,7 @@ def main() -> None:
     os.environ.setdefault("SSL_TBANK_VERIFY", "true")
 
     setup_logging()
+    setup_tracing()
     log.info("market_session_started")
 
     try:
@@ -4,7 +4,6 @@ import argparse
 import structlog
 
 from src.log_setup import setup_logging
-from src.stats import generate_report
 
 log = structlog.get_logger(__name__)
 
@@ -17,6 +16,9 @@ def main() -> None:
     parser.add_argument("--plot", action="store_true")
     args = parser.parse_args()
 
+    # imported here so argument errors and --help don't pay for pandas
+    from src.stats.services import generate_report
+
     setup_logging()
     log.info("report_generating", group=args.group, plot=args.plot)
     generate_report(group=args.group, plot=args.plot)
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -18,6 +19,7 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str
 
     LOG_LEVEL: str = "INFO"
+    LOG_DEBUG_EVENTS_PER_SECOND: int = 10
 
     DAYS_TO_MATURITY_MAX: int
     ASK_MIN_ANNUAL_YIELD: float
@@ -28,11 +30,38 @@ class Settings(BaseSettings):
     ASK_MAX_SUM_PER_PURCHASE: float
     BID_MAX_SUM_PER_BOND: float
     ASK_COOLDOWN_SECONDS: float = 300
+    STALE_BOOK_MAX_AGE_MS: float = 0
     BID_COOLDOWN_SECONDS: float = 300
+    NOT_TRADABLE_RETRY_AFTER_SECONDS: float = 900
     BLACK_LISTED_TICKERS: set[str]
+    YIELD_MODEL: Literal["simple", "xirr"] = "simple"
 
     BOND_REFRESH_INTERVAL_HOURS: int = 4
-    BID_REGISTRY_SYNC_INTERVAL_SECONDS: int = 1800
+    RAW_ORDERBOOK_DECODING: bool = False
+    ORDERBOOK_SNAPSHOT_TIMEOUT_SECONDS: float = 30
+    CATALOG_SNAPSHOT_PATH: Path = BASE_DIR / "data" / "catalog_snapshot.json.gz"
+    CATALOG_SNAPSHOT_MAX_AGE_SECONDS: int = 3600
+    EXPOSURE_RECONCILE_INTERVAL_SECONDS: int = 300
+    BROKER_HEALTHCHECK_INTERVAL_SECONDS: int = 30
+
+    METRICS_ENABLED: bool = False
+    METRICS_HOST: str = "127.0.0.1"
+    METRICS_PORT: int = 9108
+
+    TRACING_ENABLED: bool = False
+    TRACE_SAMPLE_RATE: float = 0.01
+    TRACE_EXPORT_PATH: Path | None = None
+
+    LOOP_LAG_CHECK_INTERVAL_SECONDS: float = 0.5
+    LOOP_LAG_WARN_MS: float = 100
+    LOOP_SLOW_CALLBACK_MS: float = 0
+
+    MEMORY_LOG_INTERVAL_SECONDS: int = 3600
+    MEMORY_DIAGNOSTICS_ENABLED: bool = False
+
+    PROFILE_AT_STARTUP: bool = False
+    PROFILE_WINDOW_SECONDS: float = 30
+    PROFILE_OUTPUT_DIR: Path = BASE_DIR / "data" / "profiles"
 
     @property
     def DATABASE_URL(self) -> str:
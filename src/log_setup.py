@@ -1,10 +1,81 @@
+import atexit
 import logging
+import logging.handlers
+import queue
+import sys
+import time
+from collections.abc import Callable
+from typing import Any
 
 import structlog
 
 from src.config import settings
 
 
+class Lazy:
+    """
+    Wraps a field that is costly to compute, so it is only evaluated for events that
+    pass the level check and the debug sampling: `price=Lazy(lambda: bond.ask...)`.
+    """
+
+    __slots__ = ("_fn",)
+
+    def __init__(self, fn: Callable[[], Any]) -> None:
+        self._fn = fn
+
+    def __call__(self) -> Any:
+        return self._fn()
+
+
+def _resolve_lazy(_, __, event_dict: dict) -> dict:
+    for key, value in event_dict.items():
+        if isinstance(value, Lazy):
+            event_dict[key] = value()
+    return event_dict
+
+
+def _capture_exc_info(_, __, event_dict: dict) -> dict:
+    # `log.exception` asks for the exception being handled, which only this thread
+    # knows; resolve it before the record is rendered on the listener thread
+    if event_dict.get("exc_info") is True:
+        event_dict["exc_info"] = sys.exc_info()
+    return event_dict
+
+
+class _DebugSampler:
+    """
+    Lets through at most `per_second` DEBUG events of each name per second; the next
+    one let through carries how many were dropped in between.
+    """
+
+    def __init__(self, per_second: int) -> None:
+        self._per_second = per_second
+        self._windows: dict[str, tuple[int, int, int]] = {}
+
+    def __call__(self, _, method_name: str, event_dict: dict) -> dict:
+        if method_name != "debug" or self._per_second <= 0:
+            return event_dict
+        event = event_dict.get("event", "")
+        second = int(time.monotonic())
+        window, emitted, dropped = self._windows.get(event, (second, 0, 0))
+        if window != second:
+            window, emitted = second, 0
+        if emitted >= self._per_second:
+            self._windows[event] = (window, emitted, dropped + 1)
+            raise structlog.DropEvent
+        self._windows[event] = (window, emitted + 1, 0)
+        if dropped:
+            event_dict["sampled_out"] = dropped
+        return event_dict
+
+
+class _DeferredFormattingQueueHandler(logging.handlers.QueueHandler):
+    # the stock prepare() renders the message on the calling thread; records are
+    # handed over as they are and rendered by the listener thread instead
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
 def setup_logging() -> None:
     shared = [
         structlog.contextvars.merge_contextvars,
@@ -12,7 +83,14 @@ def setup_logging() -> None:
         structlog.stdlib.add_logger_name,
     ]
     structlog.configure(
-        processors=shared + [structlog.stdlib.ProcessorFormatter.wrap_for_formatter],
+        processors=[
+            structlog.stdlib.filter_by_level,
+            _DebugSampler(settings.LOG_DEBUG_EVENTS_PER_SECOND),
+            _resolve_lazy,
+            _capture_exc_info,
+        ]
+        + shared
+        + [structlog.stdlib.ProcessorFormatter.wrap_for_formatter],
         logger_factory=structlog.stdlib.LoggerFactory(),
         wrapper_class=structlog.stdlib.BoundLogger,
         cache_logger_on_first_use=True,
@@ -28,8 +106,13 @@ def setup_logging() -> None:
     handler = logging.StreamHandler()
     handler.setFormatter(formatter)
 
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
+
     root = logging.getLogger()
-    root.handlers[:] = [handler]
+    root.handlers[:] = [_DeferredFormattingQueueHandler(log_queue)]
     root.setLevel(settings.LOG_LEVEL)
 
     logging.getLogger("t_tech").setLevel(logging.WARNING)
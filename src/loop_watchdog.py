@@ -0,0 +1,87 @@
+import asyncio
+import heapq
+import logging
+import time
+
+import structlog
+
+from src.config import settings
+from src.metrics import LOOP_LAG_SECONDS, SLOW_CALLBACKS
+
+log = structlog.get_logger(__name__)
+
+_SLOW_CALLBACK_MESSAGE = "Executing %s took %.3f seconds"
+_SLOWEST_KEPT = 5
+_SLOW_CALLBACK_REPORT_INTERVAL_SECONDS = 60
+
+
+class _SlowCallbackCollector(logging.Handler):
+    """
+    Picks up the warnings asyncio's debug mode logs for callbacks that ran longer
+    than `loop.slow_callback_duration`, keeping the slowest since the last report.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(logging.WARNING)
+        self._slowest: list[tuple[float, str]] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.msg != _SLOW_CALLBACK_MESSAGE or not record.args:
+            return
+        handle, seconds = record.args  # type: ignore[misc]
+        SLOW_CALLBACKS.inc()
+        entry = (float(seconds), str(handle)[:200])
+        if len(self._slowest) < _SLOWEST_KEPT:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    def drain(self) -> list[dict]:
+        slowest = sorted(self._slowest, reverse=True)
+        self._slowest = []
+        return [{"ms": round(s * 1000), "callback": h} for s, h in slowest]
+
+
+def _capture_slow_callbacks() -> _SlowCallbackCollector:
+    loop = asyncio.get_running_loop()
+    loop.set_debug(True)
+    loop.slow_callback_duration = settings.LOOP_SLOW_CALLBACK_MS / 1000
+    collector = _SlowCallbackCollector()
+    logging.getLogger("asyncio").addHandler(collector)
+    return collector
+
+
+async def watch_loop_lag() -> None:
+    interval = settings.LOOP_LAG_CHECK_INTERVAL_SECONDS
+    collector = (
+        _capture_slow_callbacks() if settings.LOOP_SLOW_CALLBACK_MS > 0 else None
+    )
+    last_report = time.monotonic()
+    try:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            # how much later than asked the loop got back to this task
+            lag = max(now - started - interval, 0.0)
+            LOOP_LAG_SECONDS.observe(lag)
+
+            if lag * 1000 >= settings.LOOP_LAG_WARN_MS:
+                log.warning(
+                    "event_loop_lagging",
+                    lag_ms=round(lag * 1000),
+                    threshold_ms=settings.LOOP_LAG_WARN_MS,
+                    slowest_callbacks=collector.drain() if collector else None,
+                )
+                last_report = now
+            elif (
+                collector is not None
+                and now - last_report >= _SLOW_CALLBACK_REPORT_INTERVAL_SECONDS
+            ):
+                slowest = collector.drain()
+                if slowest:
+                    log.warning("slow_callbacks_detected", slowest_callbacks=slowest)
+                last_report = now
+    finally:
+        if collector is not None:
+            logging.getLogger("asyncio").removeHandler(collector)
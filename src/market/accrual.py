@@ -0,0 +1,72 @@
+from bisect import bisect_right
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+_EXCHANGE_TZ = ZoneInfo("Europe/Moscow")
+# bond trades on the exchange settle the next trading day (T+1)
+_SETTLEMENT_LAG_DAYS = 1
+
+
+def settlement_date(trade_date: date | None = None) -> date:
+    """
+    Settlement date of a trade made on `trade_date` (today in Moscow by default). Only
+    weekends are skipped; exchange holidays are not known here.
+    """
+    on = trade_date or datetime.now(tz=_EXCHANGE_TZ).date()
+    for _ in range(_SETTLEMENT_LAG_DAYS):
+        on += timedelta(days=1)
+        while on.weekday() >= 5:
+            on += timedelta(days=1)
+    return on
+
+
+@dataclass(frozen=True)
+class CouponPeriod:
+    start: date
+    end: date
+    payment_date: date
+    # the coupon goes to whoever holds the bond at the end of this day
+    record_date: date
+    amount: float
+
+    def paid_to_holder_on(self, on: date) -> bool:
+        return on <= self.record_date
+
+
+class CouponSchedule:
+    def __init__(self, periods: Iterable[CouponPeriod]) -> None:
+        self._periods = sorted(periods, key=lambda p: p.start)
+        self._starts = [p.start for p in self._periods]
+
+    @property
+    def periods(self) -> list[CouponPeriod]:
+        return list(self._periods)
+
+    def aci_at(self, on: date) -> float | None:
+        # `on` is the settlement date; None means the schedule can't tell (no period
+        # covers the date, or the coupon isn't fixed yet), and the caller should fall
+        # back to the broker's snapshot
+        i = bisect_right(self._starts, on) - 1
+        if i < 0:
+            return None
+        period = self._periods[i]
+        if period.amount <= 0:
+            return None
+        if on >= period.end:
+            if on >= period.payment_date:
+                return None
+            # the period is over but not paid yet: the buyer pays for the whole coupon
+            # up to the record date, and for none of it after
+            return period.amount if period.paid_to_holder_on(on) else 0.0
+        length = (period.end - period.start).days
+        if length <= 0:
+            return None
+        return round(period.amount * (on - period.start).days / length, 2)
+
+    def remaining_sum(self, on: date) -> float:
+        return sum(p.amount for p in self._periods if p.paid_to_holder_on(on))
+
+    def __len__(self) -> int:
+        return len(self._periods)
@@ -1,6 +1,6 @@
 from .accounts import fetch_account_id, fetch_user_commission
-from .instruments import fetch_bond_by_figi, fetch_coupons_sum, fetch_raw_bonds
-from .market_data import fetch_orderbook, fetch_tmon_etf_price_at
+from .instruments import fetch_bond_by_figi, fetch_coupon_schedule, fetch_raw_bonds
+from .market_data import fetch_last_prices, fetch_tmon_etf_price_at
 from .operations import fetch_operations
 from .orders import (
     buy_at_ask,
@@ -18,10 +18,10 @@ __all__ = [
     "fetch_account_id",
     "fetch_active_bid_orders",
     "fetch_bond_by_figi",
-    "fetch_coupons_sum",
+    "fetch_coupon_schedule",
+    "fetch_last_prices",
     "fetch_bond_positions",
     "fetch_operations",
-    "fetch_orderbook",
     "fetch_raw_bonds",
     "fetch_tmon_etf_price_at",
     "fetch_user_commission",
@@ -10,14 +10,15 @@ from t_tech.invest.grpc.schemas import (
 )
 from t_tech.invest.grpc.utils.grpc_services import AsyncServices
 
+from src.market.accrual import CouponPeriod, CouponSchedule
 from src.market.utils import to_float
 
 log = structlog.get_logger(__name__)
 
 
-async def fetch_coupons_sum(
+async def fetch_coupon_schedule(
     client: AsyncServices, figi: str, maturity_date: datetime
-) -> float:
+) -> CouponSchedule:
     from_ = datetime.now(tz=timezone.utc)
     to = maturity_date
 
@@ -29,12 +30,25 @@ async def fetch_coupons_sum(
             from_date=from_.isoformat(),
             to_date=to.isoformat(),
         )
-        return 0.0
+        return CouponSchedule([])
 
+    # coupons paying from now on include the one whose period is currently accruing
     coupon_resp = await client.instruments.get_bond_coupons(
         request=GetBondCouponsRequest(figi=figi, from_=from_, to=to)
     )
-    return sum(to_float(c.pay_one_bond) for c in coupon_resp.events)
+    return CouponSchedule(
+        CouponPeriod(
+            start=c.coupon_start_date.date(),
+            end=c.coupon_end_date.date(),
+            payment_date=c.coupon_date.date(),
+            # an unset record date comes back as the epoch
+            record_date=(
+                c.fix_date if c.fix_date.year > 1970 else c.coupon_date
+            ).date(),
+            amount=to_float(c.pay_one_bond),
+        )
+        for c in coupon_resp.events
+    )
 
 
 async def fetch_raw_bonds(client: AsyncServices) -> list[Bond]:
@@ -5,25 +5,25 @@ from t_tech.invest.grpc.schemas import (
     CandleInterval,
     GetCandlesRequest,
     GetLastPricesRequest,
-    GetOrderBookRequest,
-    OrderBook,
 )
 from t_tech.invest.grpc.utils.grpc_services import AsyncServices
 
-from src.market.utils import to_float
+from src.market.utils import to_float, to_nano
 
 log = structlog.get_logger(__name__)
 
 _TMON_FIGI = "TCS70A106DL2"
 
 
-async def fetch_orderbook(
-    client: AsyncServices, figi: str, depth: int = 1
-) -> OrderBook:
-    response = await client.market_data.get_order_book(
-        request=GetOrderBookRequest(figi=figi, depth=depth)
+async def fetch_last_prices(client: AsyncServices, figis: list[str]) -> dict[str, int]:
+    response = await client.market_data.get_last_prices(
+        request=GetLastPricesRequest(figi=figis)
     )
-    return OrderBook(figi=figi, asks=response.asks, bids=response.bids)
+    return {
+        last_price.figi: to_nano(last_price.price)
+        for last_price in response.last_prices
+        if to_nano(last_price.price) > 0
+    }
 
 
 async def fetch_tmon_etf_price_at(
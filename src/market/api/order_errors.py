@@ -1,14 +1,21 @@
+from typing import TYPE_CHECKING
+
 import structlog
 
 from t_tech.invest.exceptions import AioRequestError
 
+from src.metrics import ORDER_OUTCOMES
+
+if TYPE_CHECKING:
+    from src.market.rejection_registry import RejectionRegistry
+
 log = structlog.get_logger(__name__)
 
 
-_INSTRUMENT_NOT_TRADABLE = "30079"
+INSTRUMENT_NOT_TRADABLE = "30079"
 _ORDER_ALREADY_EXECUTED = "30059"
 
-_HANDLED_CODES = {_INSTRUMENT_NOT_TRADABLE, _ORDER_ALREADY_EXECUTED}
+_HANDLED_CODES = {INSTRUMENT_NOT_TRADABLE, _ORDER_ALREADY_EXECUTED}
 
 
 def handle_order_error(
@@ -18,11 +25,14 @@ def handle_order_error(
     figi: str,
     ticker: str,
     order_id: str | None = None,
+    rejections: "RejectionRegistry | None" = None,
 ) -> None:
     code = (e.details or "").partition(":")[0].strip()
+    ORDER_OUTCOMES.inc(operation, code or "unknown")
     if code not in _HANDLED_CODES:
         raise e
     message = e.metadata.message if e.metadata else ""
+    suppressed = rejections is not None and rejections.record(figi, code)
     log.warning(
         "broker_order_error_handled",
         operation=operation,
@@ -31,4 +41,5 @@ def handle_order_error(
         order_id=order_id,
         code=code,
         message=message,
+        suppressed=suppressed,
     )
@@ -19,10 +19,12 @@ from t_tech.invest.grpc.schemas import (
 from t_tech.invest.grpc.utils.grpc_services import AsyncServices
 
 from src.market.api.order_errors import handle_order_error
-from src.market.utils import from_float, to_float
+from src.market.utils import from_nano, to_float
+from src.metrics import ORDER_OUTCOMES
 
 if TYPE_CHECKING:
     from src.market.domain import EnrichedBond
+    from src.market.rejection_registry import RejectionRegistry
 
 log = structlog.get_logger(__name__)
 
@@ -40,16 +42,19 @@ _RESTING_ORDER_STATUSES = {
 
 
 async def buy_at_ask(
-    client: AsyncServices, account_id: str, bond: "EnrichedBond", quantity: int
+    client: AsyncServices,
+    account_id: str,
+    bond: "EnrichedBond",
+    quantity: int,
+    rejections: "RejectionRegistry | None" = None,
 ) -> float | None:
-
     try:
         response = await client.orders.post_order(
             request=PostOrderRequest(
                 account_id=account_id,
                 figi=bond.figi,
                 quantity=quantity,
-                price=bond.orderbook.asks[0].price,
+                price=from_nano(bond.ask_price_nano),
                 direction=OrderDirection.ORDER_DIRECTION_BUY,
                 order_type=OrderType.ORDER_TYPE_LIMIT,
                 time_in_force=TimeInForceType.TIME_IN_FORCE_FILL_OR_KILL,
@@ -57,8 +62,15 @@ async def buy_at_ask(
             )
         )
     except AioRequestError as e:
-        handle_order_error(e, operation="ask_buy", figi=bond.figi, ticker=bond.ticker)
+        handle_order_error(
+            e,
+            operation="ask_buy",
+            figi=bond.figi,
+            ticker=bond.ticker,
+            rejections=rejections,
+        )
         return None
+    ORDER_OUTCOMES.inc("ask_buy", response.execution_report_status.name)
     if (
         response.execution_report_status
         != OrderExecutionReportStatus.EXECUTION_REPORT_STATUS_FILL
@@ -79,7 +91,8 @@ async def place_bid_order(
     account_id: str,
     bond: "EnrichedBond",
     quantity: int,
-    price_percent: float,
+    price_nano: int,
+    rejections: "RejectionRegistry | None" = None,
 ) -> PostOrderResponse | None:
     try:
         response = await client.orders.post_order(
@@ -87,7 +100,7 @@ async def place_bid_order(
                 account_id=account_id,
                 figi=bond.figi,
                 quantity=quantity,
-                price=from_float(price_percent),
+                price=from_nano(price_nano),
                 direction=OrderDirection.ORDER_DIRECTION_BUY,
                 order_type=OrderType.ORDER_TYPE_LIMIT,
                 time_in_force=TimeInForceType.TIME_IN_FORCE_DAY,
@@ -95,8 +108,15 @@ async def place_bid_order(
             )
         )
     except AioRequestError as e:
-        handle_order_error(e, operation="bid_place", figi=bond.figi, ticker=bond.ticker)
+        handle_order_error(
+            e,
+            operation="bid_place",
+            figi=bond.figi,
+            ticker=bond.ticker,
+            rejections=rejections,
+        )
         return None
+    ORDER_OUTCOMES.inc("bid_place", response.execution_report_status.name)
     if response.execution_report_status not in _ACCEPTED_ORDER_STATUSES:
         log.warning(
             "bid_not_accepted",
@@ -115,7 +135,8 @@ async def replace_bid_order(
     bond: "EnrichedBond",
     old_order_id: str,
     quantity: int,
-    price_percent: float,
+    price_nano: int,
+    rejections: "RejectionRegistry | None" = None,
 ) -> PostOrderResponse | None:
     try:
         response = await client.orders.replace_order(
@@ -124,7 +145,7 @@ async def replace_bid_order(
                 order_id=old_order_id,
                 idempotency_key=str(uuid.uuid4()),
                 quantity=quantity,
-                price=from_float(price_percent),
+                price=from_nano(price_nano),
                 price_type=PriceType.PRICE_TYPE_POINT,
             )
         )
@@ -135,8 +156,10 @@ async def replace_bid_order(
             figi=bond.figi,
             ticker=bond.ticker,
             order_id=old_order_id,
+            rejections=rejections,
         )
         return None
+    ORDER_OUTCOMES.inc("bid_replace", response.execution_report_status.name)
     if response.execution_report_status not in _ACCEPTED_ORDER_STATUSES:
         log.warning(
             "replace_bid_not_accepted",
@@ -168,6 +191,8 @@ async def cancel_bid_order(
             ticker=bond.ticker,
             order_id=order_id,
         )
+        return
+    ORDER_OUTCOMES.inc("bid_cancel", "cancelled")
 
 
 async def fetch_active_bid_orders(
@@ -0,0 +1,89 @@
+import asyncio
+import time
+from collections.abc import AsyncGenerator, Iterable
+
+from google.protobuf import descriptor_pool, message_factory
+from t_tech.invest.grpc.schemas import SubscriptionAction
+from t_tech.invest.grpc.utils.grpc_services import AsyncServices
+
+from src.market.domain import TopOfBook, TradingStatusUpdate
+from src.market.latency import observe_stream_alive
+from src.market.utils import NANO
+
+# message classes are looked up by their proto name in the pool the SDK's generated
+# modules register into, so this doesn't depend on where the SDK keeps them
+_PROTO_PACKAGE = "tinkoff.public.invest.api.contract.v1"
+
+
+def _message_class(name: str) -> type:
+    descriptor = descriptor_pool.Default().FindMessageTypeByName(
+        f"{_PROTO_PACKAGE}.{name}"
+    )
+    return message_factory.GetMessageClass(descriptor)
+
+
+def _order_book_request(action: SubscriptionAction, figis: Iterable[str], depth: int):
+    request = _message_class("MarketDataRequest")()
+    subscribe = request.subscribe_order_book_request
+    subscribe.subscription_action = action
+    for figi in figis:
+        subscribe.instruments.add(figi=figi, depth=depth)
+    return request
+
+
+def _info_request(action: SubscriptionAction, figis: Iterable[str]):
+    request = _message_class("MarketDataRequest")()
+    subscribe = request.subscribe_info_request
+    subscribe.subscription_action = action
+    for figi in figis:
+        subscribe.instruments.add(figi=figi)
+    return request
+
+
+async def stream_market_data(
+    client: AsyncServices,
+    subscriptions: asyncio.Queue[tuple[SubscriptionAction, list[str]]],
+    depth: int = 1,
+) -> AsyncGenerator[TopOfBook | TradingStatusUpdate]:
+    """
+    Streams order books as bare top-of-book levels, plus trading-status changes, reading
+    the protobuf messages straight off the SDK's gRPC stub instead of letting it build
+    schema dataclasses. Subscription changes are read from `subscriptions` for as long
+    as the stream lives and apply to both.
+    """
+
+    async def request_iterator():
+        while True:
+            action, figis = await subscriptions.get()
+            yield _order_book_request(action, figis, depth)
+            yield _info_request(action, figis)
+
+    service = client.market_data_stream
+    async for response in service.stub.MarketDataStream(
+        request_iterator(), metadata=service.metadata
+    ):
+        if response.HasField("ping"):
+            ping = response.ping.time
+            observe_stream_alive(ping.seconds + ping.nanos / 1e9)
+            continue
+        if response.HasField("trading_status"):
+            status = response.trading_status
+            yield TradingStatusUpdate(
+                figi=status.figi, trading_status=status.trading_status
+            )
+            continue
+        if not response.HasField("orderbook"):
+            continue
+        received_ts = time.time()
+        orderbook = response.orderbook
+        ask = orderbook.asks[0] if orderbook.asks else None
+        bid = orderbook.bids[0] if orderbook.bids else None
+        yield TopOfBook(
+            figi=orderbook.figi,
+            ask_price_nano=ask.price.units * NANO + ask.price.nano if ask else 0,
+            ask_quantity=ask.quantity if ask else 0,
+            bid_price_nano=bid.price.units * NANO + bid.price.nano if bid else 0,
+            bid_quantity=bid.quantity if bid else 0,
+            exchange_ts=orderbook.time.seconds + orderbook.time.nanos / 1e9,
+            received_ts=received_ts,
+        )
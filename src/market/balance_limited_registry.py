@@ -0,0 +1,15 @@
+class BalanceLimitedRegistry:
+    def __init__(self) -> None:
+        self._figis: set[str] = set()
+
+    def mark(self, figi: str) -> None:
+        self._figis.add(figi)
+
+    def discard(self, figi: str) -> None:
+        self._figis.discard(figi)
+
+    def figis(self) -> set[str]:
+        return set(self._figis)
+
+    def __len__(self) -> int:
+        return len(self._figis)
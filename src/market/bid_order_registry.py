@@ -6,7 +6,7 @@ from dataclasses import dataclass
 class ActiveBidOrder:
     order_id: str
     figi: str
-    price_percent: float
+    price_nano: int
     quantity: int
 
 
@@ -33,6 +33,9 @@ class BidOrderRegistry:
     def get(self, figi: str, order_id: str) -> ActiveBidOrder | None:
         return self._by_figi.get(figi, {}).get(order_id)
 
+    def figis(self) -> set[str]:
+        return set(self._by_figi)
+
     def bids_for(self, figi: str) -> list[ActiveBidOrder]:
         return list(self._by_figi.get(figi, {}).values())
 
@@ -47,3 +50,6 @@ class BidOrderRegistry:
             if order_id in bucket:
                 return bucket[order_id]
         return None
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self._by_figi.values())
@@ -1,17 +1,84 @@
+import heapq
 from collections.abc import Iterable
 
 from src.market.domain import EnrichedBond
 
+# superseded heap entries are dropped lazily; rebuild once they outnumber live ones
+_YIELD_HEAP_SLACK = 4
+
+
+class _YieldIndex:
+    """Max-heap of the latest yield per FIGI."""
+
+    def __init__(self) -> None:
+        self._yields: dict[str, float] = {}
+        self._heap: list[tuple[float, str]] = []
+
+    def set(self, figi: str, annual_yield: float | None) -> None:
+        if annual_yield is None:
+            self._yields.pop(figi, None)
+            return
+        if self._yields.get(figi) == annual_yield:
+            return
+        self._yields[figi] = annual_yield
+        heapq.heappush(self._heap, (-annual_yield, figi))
+        if len(self._heap) > _YIELD_HEAP_SLACK * len(self._yields):
+            self._heap = [(-y, figi) for figi, y in self._yields.items()]
+            heapq.heapify(self._heap)
+
+    def at_least(self, threshold: float) -> list[str]:
+        live: list[tuple[float, str]] = []
+        seen: set[str] = set()
+        while self._heap and -self._heap[0][0] >= threshold:
+            entry = heapq.heappop(self._heap)
+            neg_yield, figi = entry
+            # a yield that changed and changed back leaves two equal entries
+            if self._yields.get(figi) == -neg_yield and figi not in seen:
+                live.append(entry)
+                seen.add(figi)
+        for entry in live:
+            heapq.heappush(self._heap, entry)
+        return [figi for _, figi in live]
+
 
 class BondCatalog:
     def __init__(self) -> None:
         self._by_figi: dict[str, EnrichedBond] = {}
+        self._ask_yields = _YieldIndex()
+        self._bid_yields = _YieldIndex()
 
     def replace_all(self, bonds: Iterable[EnrichedBond]) -> None:
         self._by_figi = {bond.figi: bond for bond in bonds}
+        self._ask_yields = _YieldIndex()
+        self._bid_yields = _YieldIndex()
+        for bond in self._by_figi.values():
+            self.update_yields(bond)
 
     def get(self, figi: str) -> EnrichedBond | None:
         return self._by_figi.get(figi)
 
     def all(self) -> list[EnrichedBond]:
         return list(self._by_figi.values())
+
+    def update_yields(self, bond: EnrichedBond) -> None:
+        if bond.figi not in self._by_figi:
+            return
+        self._ask_yields.set(
+            bond.figi, bond.ask.annual_yield if bond.ask_price_nano > 0 else None
+        )
+        self._bid_yields.set(
+            bond.figi, bond.bid.annual_yield if bond.bid_price_nano > 0 else None
+        )
+
+    def asks_yielding_at_least(self, annual_yield: float) -> list[EnrichedBond]:
+        """
+        Bonds whose top ask yielded at least `annual_yield` at their last book change,
+        best first. Yields are not re-priced as days pass, so callers recheck them.
+        """
+        return [self._by_figi[f] for f in self._ask_yields.at_least(annual_yield)]
+
+    def bids_yielding_at_least(self, annual_yield: float) -> list[EnrichedBond]:
+        return [self._by_figi[f] for f in self._bid_yields.at_least(annual_yield)]
+
+    def __len__(self) -> int:
+        return len(self._by_figi)
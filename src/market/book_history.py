@@ -0,0 +1,130 @@
+import time
+from array import array
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from src.market.domain import TopOfBook
+
+_DEFAULT_CAPACITY = 256
+
+
+@dataclass(frozen=True)
+class BookStats:
+    samples: int
+    spread_nano: int | None
+    ticks_per_second: float
+    seconds_since_change: float | None
+
+
+class BookHistory:
+    """
+    Fixed-size ring of top-of-book snapshots backed by flat typed arrays, so appending
+    a tick writes five slots in place and never allocates.
+    """
+
+    __slots__ = (
+        "_capacity",
+        "_count",
+        "_next",
+        "_last_change_at",
+        "_at",
+        "_ask_price",
+        "_ask_quantity",
+        "_bid_price",
+        "_bid_quantity",
+    )
+
+    def __init__(self, capacity: int = _DEFAULT_CAPACITY) -> None:
+        self._capacity = capacity
+        self._count = 0
+        self._next = 0
+        self._last_change_at: float | None = None
+        self._at = array("d", bytes(8 * capacity))
+        self._ask_price = array("q", bytes(8 * capacity))
+        self._ask_quantity = array("q", bytes(8 * capacity))
+        self._bid_price = array("q", bytes(8 * capacity))
+        self._bid_quantity = array("q", bytes(8 * capacity))
+
+    def append(self, top: TopOfBook, at: float) -> None:
+        i = self._next
+        last = i - 1 if i else self._capacity - 1
+        if (
+            self._count == 0
+            or self._ask_price[last] != top.ask_price_nano
+            or self._bid_price[last] != top.bid_price_nano
+        ):
+            self._last_change_at = at
+
+        self._at[i] = at
+        self._ask_price[i] = top.ask_price_nano
+        self._ask_quantity[i] = top.ask_quantity
+        self._bid_price[i] = top.bid_price_nano
+        self._bid_quantity[i] = top.bid_quantity
+
+        self._next = i + 1 if i + 1 < self._capacity else 0
+        if self._count < self._capacity:
+            self._count += 1
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _last_index(self) -> int:
+        return self._next - 1 if self._next else self._capacity - 1
+
+    def _oldest_index(self) -> int:
+        return 0 if self._count < self._capacity else self._next
+
+    def spread_nano(self) -> int | None:
+        if not self._count:
+            return None
+        i = self._last_index()
+        ask, bid = self._ask_price[i], self._bid_price[i]
+        if ask <= 0 or bid <= 0:
+            return None
+        return ask - bid
+
+    def ticks_per_second(self) -> float:
+        if self._count < 2:
+            return 0.0
+        span = self._at[self._last_index()] - self._at[self._oldest_index()]
+        return (self._count - 1) / span if span > 0 else 0.0
+
+    def seconds_since_change(self, now: float | None = None) -> float | None:
+        if self._last_change_at is None:
+            return None
+        return (time.monotonic() if now is None else now) - self._last_change_at
+
+    def stats(self, now: float | None = None) -> BookStats:
+        return BookStats(
+            samples=self._count,
+            spread_nano=self.spread_nano(),
+            ticks_per_second=self.ticks_per_second(),
+            seconds_since_change=self.seconds_since_change(now),
+        )
+
+
+class BookHistoryRegistry:
+    def __init__(self, capacity: int = _DEFAULT_CAPACITY) -> None:
+        self._capacity = capacity
+        self._by_figi: dict[str, BookHistory] = {}
+
+    def record(self, top: TopOfBook, at: float | None = None) -> None:
+        history = self._by_figi.get(top.figi)
+        if history is None:
+            history = self._by_figi[top.figi] = BookHistory(self._capacity)
+        history.append(top, time.monotonic() if at is None else at)
+
+    def get(self, figi: str) -> BookHistory | None:
+        return self._by_figi.get(figi)
+
+    def stats(self, figi: str) -> BookStats | None:
+        history = self._by_figi.get(figi)
+        return history.stats() if history is not None else None
+
+    def retain(self, figis: Iterable[str]) -> None:
+        keep = set(figis)
+        for figi in self._by_figi.keys() - keep:
+            del self._by_figi[figi]
+
+    def __len__(self) -> int:
+        return len(self._by_figi)
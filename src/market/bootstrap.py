@@ -0,0 +1,18 @@
+import time
+from collections.abc import Awaitable
+
+import structlog
+
+log = structlog.get_logger(__name__)
+
+
+async def timed_step[T](step: str, awaitable: Awaitable[T]) -> T:
+    started = time.monotonic()
+    try:
+        return await awaitable
+    finally:
+        log.info(
+            "step_finished",
+            step=step,
+            duration_ms=round((time.monotonic() - started) * 1000),
+        )
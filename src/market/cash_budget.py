@@ -0,0 +1,15 @@
+class CashBudget:
+    def __init__(self, available: float) -> None:
+        self._available = available
+
+    @property
+    def available(self) -> float:
+        return self._available
+
+    def spend(self, amount: float) -> None:
+        if amount > 0:
+            self._available = max(0.0, self._available - amount)
+
+    def refund(self, amount: float) -> None:
+        if amount > 0:
+            self._available += amount
@@ -0,0 +1,102 @@
+import gzip
+import json
+import os
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+import structlog
+
+from src.market.accrual import CouponPeriod, CouponSchedule
+from src.market.domain import EnrichedBond, TopOfBook
+
+log = structlog.get_logger(__name__)
+
+_VERSION = 2
+
+
+def _bond_to_dict(bond: EnrichedBond) -> dict:
+    return {
+        "name": bond.name,
+        "figi": bond.figi,
+        "ticker": bond.ticker,
+        "nominal": bond.nominal,
+        "aci_snapshot": bond.aci_snapshot,
+        "maturity_date": bond.maturity_date.isoformat(),
+        "risk_level": int(bond.risk_level),
+        "is_unlimited": bond.is_unlimited,
+        "currency": bond.currency,
+        "nominal_currency": bond.nominal_currency,
+        "for_qual_investor": bond.for_qual_investor,
+        "trading_status": int(bond.trading_status),
+        "commission_percent": bond.commission_percent,
+        "min_price_increment_nano": bond.min_price_increment_nano,
+        "coupons": [
+            [
+                p.start.isoformat(),
+                p.end.isoformat(),
+                p.payment_date.isoformat(),
+                p.record_date.isoformat(),
+                p.amount,
+            ]
+            for p in bond.coupon_schedule.periods
+        ],
+    }
+
+
+def _bond_from_dict(data: dict) -> EnrichedBond:
+    fields = dict(data)
+    fields["maturity_date"] = datetime.fromisoformat(data["maturity_date"])
+    fields["coupon_schedule"] = CouponSchedule(
+        CouponPeriod(
+            start=date.fromisoformat(start),
+            end=date.fromisoformat(end),
+            payment_date=date.fromisoformat(payment_date),
+            record_date=date.fromisoformat(record_date),
+            amount=amount,
+        )
+        for start, end, payment_date, record_date, amount in fields.pop("coupons")
+    )
+    fields["top"] = TopOfBook.empty(data["figi"])
+    return EnrichedBond(**fields)
+
+
+def save_catalog_snapshot(path: Path, bonds: list[EnrichedBond]) -> None:
+    """
+    Writes the static part of the catalog (no order books) so a restart can trade
+    before the full enrichment has run again.
+    """
+    payload = {
+        "version": _VERSION,
+        "saved_at": time.time(),
+        "bonds": [_bond_to_dict(bond) for bond in bonds],
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(payload, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def load_catalog_snapshot(
+    path: Path, max_age_seconds: float
+) -> list[EnrichedBond] | None:
+    if not path.exists():
+        return None
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("version") != _VERSION:
+            log.info("catalog_snapshot_skipped", reason="version_mismatch")
+            return None
+        age = time.time() - payload["saved_at"]
+        if age > max_age_seconds:
+            log.info("catalog_snapshot_skipped", reason="stale", age_s=round(age))
+            return None
+        bonds = [_bond_from_dict(data) for data in payload["bonds"]]
+    except (OSError, ValueError, KeyError, TypeError):
+        log.exception("catalog_snapshot_unreadable", path=str(path))
+        return None
+
+    log.info("catalog_snapshot_loaded", count=len(bonds), age_s=round(age))
+    return bonds
@@ -0,0 +1,266 @@
+import asyncio
+import re
+import time
+from collections import Counter
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+from contextlib import aclosing
+from enum import StrEnum
+from functools import cache
+from typing import Self
+
+import structlog
+from grpc import aio
+from t_tech.invest.exceptions import AioRequestError
+from t_tech.invest.grpc import AsyncClient  # type: ignore
+from t_tech.invest.grpc.utils.grpc_services import AsyncServices
+
+from src.metrics import (
+    BROKER_CONNECTION_HEALTH,
+    BROKER_PROBE_LATENCY_SECONDS,
+    RPC_SECONDS,
+)
+from src.tracing import span
+
+log = structlog.get_logger(__name__)
+
+# keep the HTTP/2 connection alive between ticks so the order path never pays for
+# a fresh TLS handshake or a silently dropped idle channel
+_CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 20_000),
+    ("grpc.keepalive_timeout_ms", 10_000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.enable_retries", 1),
+]
+
+_PROBE_TIMEOUT_SECONDS = 5
+_FAILURES_BEFORE_RECONNECT = 2
+# how long a reconnect waits for streams to move over before closing the old channel
+_REATTACH_GRACE_SECONDS = 10
+
+
+@cache
+def _rpc_method_name(method: str | bytes) -> str:
+    # "/tinkoff.public.invest.api.contract.v1.OrdersService/PostOrder" -> "post_order"
+    if isinstance(method, bytes):
+        method = method.decode()
+    name = method.rsplit("/", 1)[-1]
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+
+class _RpcLatencyInterceptor(aio.UnaryUnaryClientInterceptor):
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        method = _rpc_method_name(client_call_details.method)
+        started = time.perf_counter()
+        try:
+            with span(f"rpc.{method}"):
+                call = await continuation(client_call_details, request)
+                await call
+            return call
+        finally:
+            RPC_SECONDS.observe(time.perf_counter() - started, method)
+
+
+class ConnectionHealth(StrEnum):
+    CLOSED = "CLOSED"
+    CONNECTING = "CONNECTING"
+    READY = "READY"
+    DEGRADED = "DEGRADED"
+
+
+class BrokerConnection:
+    def __init__(self, token: str) -> None:
+        self._token = token
+        self._client: AsyncClient | None = None
+        self._services: AsyncServices | None = None
+        self._reconnect_lock = asyncio.Lock()
+        self._consecutive_failures = 0
+        self._replaced = asyncio.Event()
+        self._attached: Counter[int] = Counter()
+        self._attached_changed = asyncio.Event()
+        self.generation = 0
+        self.health = ConnectionHealth.CLOSED
+        self._set_health(ConnectionHealth.CLOSED)
+        self.last_probe_latency_s: float | None = None
+
+    def _set_health(self, health: ConnectionHealth) -> None:
+        for state in ConnectionHealth:
+            BROKER_CONNECTION_HEALTH.set(1.0 if state == health else 0.0, state.value)
+        self.health = health
+
+    @property
+    def client(self) -> AsyncServices:
+        if self._services is None:
+            raise RuntimeError("Broker connection is not open")
+        return self._services
+
+    async def __aenter__(self) -> Self:
+        await self._connect()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._close(self._client)
+        self._client = None
+        self._services = None
+        self._set_health(ConnectionHealth.CLOSED)
+
+    async def _connect(self) -> None:
+        self._set_health(ConnectionHealth.CONNECTING)
+        client = AsyncClient(
+            self._token,
+            options=_CHANNEL_OPTIONS,
+            interceptors=[_RpcLatencyInterceptor()],
+        )
+        try:
+            self._services = await client.__aenter__()
+        except Exception:
+            self._set_health(ConnectionHealth.DEGRADED)
+            raise
+        self._client = client
+        self.generation += 1
+        self._replaced.set()
+        self._replaced = asyncio.Event()
+        log.info("broker_connection_opened", generation=self.generation)
+        await self.probe()
+
+    async def _close(self, client: AsyncClient | None) -> None:
+        if client is None:
+            return
+        try:
+            await client.__aexit__(None, None, None)
+        except Exception:
+            log.exception("broker_connection_close_failed")
+
+    async def probe(self) -> bool:
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(_PROBE_TIMEOUT_SECONDS):
+                await self.client.users.get_accounts()
+        except (AioRequestError, TimeoutError) as e:
+            self._consecutive_failures += 1
+            self._set_health(ConnectionHealth.DEGRADED)
+            log.warning(
+                "broker_connection_probe_failed",
+                generation=self.generation,
+                consecutive_failures=self._consecutive_failures,
+                error=repr(e),
+            )
+            return False
+
+        self.last_probe_latency_s = time.monotonic() - started
+        BROKER_PROBE_LATENCY_SECONDS.set(self.last_probe_latency_s)
+        self._consecutive_failures = 0
+        self._set_health(ConnectionHealth.READY)
+        log.debug(
+            "broker_connection_probed",
+            generation=self.generation,
+            latency_s=self.last_probe_latency_s,
+        )
+        return True
+
+    async def stream[T](
+        self,
+        name: str,
+        open_stream: Callable[[AsyncServices], AsyncGenerator[T]],
+        quiet: bool = False,
+    ) -> AsyncGenerator[T]:
+        """
+        Yields from a server stream and reopens it on the new channel after every
+        reconnect, before the old channel is closed, so the consumer never sees the
+        switch. A busy stream moves on its next message; a `quiet` one moves right away,
+        at the cost of a task per message.
+        """
+        while True:
+            generation = self.generation
+            replaced = self._replaced
+            self._attached[generation] += 1
+            try:
+                async with aclosing(open_stream(self.client)) as stream:
+                    items = self._until_replaced(stream, replaced) if quiet else stream
+                    async with aclosing(items):
+                        async for item in items:
+                            yield item
+                            if self.generation != generation:
+                                break
+                        else:
+                            if self.generation == generation:
+                                return
+            # the old channel was closed under a stream that hadn't moved yet; gRPC
+            # reports locally cancelled calls as a cancellation of the reading task
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if self.generation == generation or (task and task.cancelling()):
+                    raise
+            except Exception:
+                if self.generation == generation:
+                    raise
+            finally:
+                self._attached[generation] -= 1
+                self._attached_changed.set()
+            log.info(
+                "broker_stream_reattached", stream=name, generation=self.generation
+            )
+
+    @staticmethod
+    async def _until_replaced[T](
+        stream: AsyncIterator[T], replaced: asyncio.Event
+    ) -> AsyncGenerator[T]:
+        # ends, with the pending read cancelled, once the channel is replaced
+        waiter = asyncio.ensure_future(replaced.wait())
+        item: asyncio.Future[T] | None = None
+        try:
+            while True:
+                item = asyncio.ensure_future(anext(stream))
+                await asyncio.wait({item, waiter}, return_when=asyncio.FIRST_COMPLETED)
+                if not item.done():
+                    return
+                try:
+                    value = item.result()
+                except StopAsyncIteration:
+                    return
+                yield value
+        finally:
+            waiter.cancel()
+            # the read must be finished before the stream itself can be closed
+            if item is not None and not item.done():
+                item.cancel()
+                await asyncio.wait({item})
+
+    async def _wait_detached(self, generation: int) -> None:
+        try:
+            async with asyncio.timeout(_REATTACH_GRACE_SECONDS):
+                while self._attached[generation] > 0:
+                    self._attached_changed.clear()
+                    await self._attached_changed.wait()
+        except TimeoutError:
+            # a busy stream that got no message yet is moved by the close instead
+            log.info(
+                "broker_streams_not_reattached",
+                generation=generation,
+                count=self._attached[generation],
+            )
+        del self._attached[generation]
+
+    async def reconnect(self, seen_generation: int | None = None) -> None:
+        async with self._reconnect_lock:
+            # another caller already replaced the channel this one saw failing
+            if seen_generation is not None and seen_generation != self.generation:
+                return
+            old_client, old_generation = self._client, self.generation
+            await self._connect()
+            await self._wait_detached(old_generation)
+            await self._close(old_client)
+            log.info("broker_connection_reconnected", generation=self.generation)
+
+    async def maintain(self, interval_s: float) -> None:
+        while True:
+            await asyncio.sleep(interval_s)
+            if await self.probe():
+                continue
+            if self._consecutive_failures < _FAILURES_BEFORE_RECONNECT:
+                continue
+            try:
+                await self.reconnect(self.generation)
+            except Exception:
+                # the old channel stays in use; the next failed probe tries again
+                log.exception("broker_reconnect_failed", generation=self.generation)
@@ -3,19 +3,32 @@ from dataclasses import dataclass
 
 from t_tech.invest.grpc.utils.grpc_services import AsyncServices
 
+from src.market.balance_limited_registry import BalanceLimitedRegistry
 from src.market.bid_order_registry import BidOrderRegistry
 from src.market.bond_catalog import BondCatalog
+from src.market.book_history import BookHistoryRegistry
+from src.market.connection import BrokerConnection
 from src.market.cooldown_registry import CooldownRegistry
+from src.market.exposure_ledger import ExposureLedger
+from src.market.rejection_registry import RejectionRegistry
 from src.stats import MaturityRepository, PurchaseRepository
 
 
 @dataclass
 class MarketContext:
-    client: AsyncServices
+    connection: BrokerConnection
     account_id: str
     bid_registry: BidOrderRegistry
     bid_registry_lock: asyncio.Lock
     catalog: BondCatalog
+    book_history: BookHistoryRegistry
     cooldown_registry: CooldownRegistry
+    rejection_registry: RejectionRegistry
+    exposure: ExposureLedger
+    balance_limited: BalanceLimitedRegistry
     purchase_repo: PurchaseRepository
     maturity_repo: MaturityRepository
+
+    @property
+    def client(self) -> AsyncServices:
+        return self.connection.client
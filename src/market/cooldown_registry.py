@@ -2,10 +2,16 @@ import time
 
 from src.stats.models import PurchaseStrategy
 
+# marks are swept for expired entries once this many have been added since the last
+# sweep, so the map stays bounded by the bonds marked within one cooldown window
+_PRUNE_EVERY = 256
+
 
 class CooldownRegistry:
-    def __init__(self) -> None:
+    def __init__(self, max_window_s: float) -> None:
+        self._max_window_s = max_window_s
         self._last: dict[tuple[PurchaseStrategy, str], float] = {}
+        self._marks_since_prune = 0
 
     def on_cooldown(
         self, strategy: PurchaseStrategy, figi: str, window_s: float
@@ -14,4 +20,17 @@ class CooldownRegistry:
         return last is not None and time.monotonic() - last < window_s
 
     def mark(self, strategy: PurchaseStrategy, figi: str) -> None:
-        self._last[(strategy, figi)] = time.monotonic()
+        now = time.monotonic()
+        self._last[(strategy, figi)] = now
+        self._marks_since_prune += 1
+        if self._marks_since_prune >= _PRUNE_EVERY:
+            self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        self._last = {
+            key: at for key, at in self._last.items() if now - at < self._max_window_s
+        }
+        self._marks_since_prune = 0
+
+    def __len__(self) -> int:
+        return len(self._last)
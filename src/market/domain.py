@@ -1,11 +1,26 @@
-from dataclasses import dataclass
-from datetime import datetime, timezone
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
 from enum import StrEnum
 from typing import Self
 
-from t_tech.invest.grpc.schemas import Bond, OrderBook
+from t_tech.invest.grpc.schemas import Bond, OrderBook, SecurityTradingStatus
 
-from .utils import to_float
+from src.config import settings
+
+from .accrual import CouponSchedule, settlement_date
+from .utils import nano_to_float, to_float, to_nano
+from .yield_engine import DAYS_IN_YEAR, xirr_yields
+
+_XIRR_CACHE_SIZE = 256
+
+# dealer-mode normal trading is still a live book the broker accepts orders against
+_NORMAL_TRADING_STATUSES = frozenset(
+    {
+        SecurityTradingStatus.SECURITY_TRADING_STATUS_NORMAL_TRADING,
+        SecurityTradingStatus.SECURITY_TRADING_STATUS_DEALER_NORMAL_TRADING,
+    }
+)
 
 
 class MaturityEventType(StrEnum):
@@ -21,6 +36,60 @@ class MaturityEvent:
     operation_date: datetime
 
 
+@dataclass(frozen=True, slots=True)
+class TopOfBook:
+    figi: str
+    ask_price_nano: int
+    ask_quantity: int
+    bid_price_nano: int
+    bid_quantity: int
+    # wall-clock epoch seconds; 0 when unknown
+    exchange_ts: float = 0.0
+    received_ts: float = 0.0
+
+    @classmethod
+    def empty(cls, figi: str) -> Self:
+        return cls(
+            figi=figi,
+            ask_price_nano=0,
+            ask_quantity=0,
+            bid_price_nano=0,
+            bid_quantity=0,
+        )
+
+    @classmethod
+    def from_last_price(cls, figi: str, price_nano: int) -> Self:
+        # a reference level with no size behind it: enough to value and rank the bond,
+        # never enough for the ask sniper to size a purchase against
+        return cls(
+            figi=figi,
+            ask_price_nano=price_nano,
+            ask_quantity=0,
+            bid_price_nano=price_nano,
+            bid_quantity=0,
+        )
+
+    @classmethod
+    def from_orderbook(cls, orderbook: OrderBook) -> Self:
+        ask = orderbook.asks[0] if orderbook.asks else None
+        bid = orderbook.bids[0] if orderbook.bids else None
+        return cls(
+            figi=orderbook.figi,
+            ask_price_nano=to_nano(ask.price) if ask else 0,
+            ask_quantity=ask.quantity if ask else 0,
+            bid_price_nano=to_nano(bid.price) if bid else 0,
+            bid_quantity=bid.quantity if bid else 0,
+            exchange_ts=orderbook.time.timestamp() if orderbook.time else 0.0,
+            received_ts=time.time(),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class TradingStatusUpdate:
+    figi: str
+    trading_status: int
+
+
 @dataclass(frozen=True)
 class PriceView:
     price_percent: float
@@ -37,7 +106,7 @@ class EnrichedBond:
     figi: str
     ticker: str
     nominal: float
-    aci_value: float
+    aci_snapshot: float
     maturity_date: datetime
     risk_level: int
     is_unlimited: bool
@@ -46,29 +115,99 @@ class EnrichedBond:
     for_qual_investor: bool
     trading_status: int
     commission_percent: float
-    coupons_sum: float
-    min_price_increment: float
-    orderbook: OrderBook
+    coupon_schedule: CouponSchedule
+    min_price_increment_nano: int
+    top: TopOfBook
+    _accrual: tuple[date, float, float] | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _xirr_date: date | None = field(default=None, init=False, repr=False, compare=False)
+    _xirr_cache: dict[float, float] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
 
     @property
     def days_to_maturity(self) -> int:
         return (self.maturity_date.date() - datetime.now(tz=timezone.utc).date()).days
 
+    def _accrual_on(self, on: date) -> tuple[float, float]:
+        if self._accrual is None or self._accrual[0] != on:
+            aci = self.coupon_schedule.aci_at(on)
+            self._accrual = (
+                on,
+                self.aci_snapshot if aci is None else aci,
+                self.coupon_schedule.remaining_sum(on),
+            )
+        return self._accrual[1], self._accrual[2]
+
+    def aci_at(self, settles_on: date | None = None) -> float:
+        """ACI paid for a trade settling on `settles_on` (today's trade by default)."""
+        return self._accrual_on(settles_on or settlement_date())[0]
+
+    def coupons_sum_at(self, settles_on: date | None = None) -> float:
+        return self._accrual_on(settles_on or settlement_date())[1]
+
+    @property
+    def aci_value(self) -> float:
+        return self.aci_at()
+
+    @property
+    def coupons_sum(self) -> float:
+        return self.coupons_sum_at()
+
     @property
     def full_return(self) -> float:
         return self.nominal + self.coupons_sum
 
-    def at(self, price_percent: float) -> PriceView:
+    def cashflows(self, on: date) -> tuple[list[float], list[float]]:
+        maturity = self.maturity_date.date()
+        coupons = [
+            p
+            for p in self.coupon_schedule.periods
+            if p.paid_to_holder_on(on) and p.payment_date <= maturity
+        ]
+        amounts = [p.amount for p in coupons] + [self.nominal]
+        times = [(p.payment_date - on).days / DAYS_IN_YEAR for p in coupons] + [
+            (maturity - on).days / DAYS_IN_YEAR
+        ]
+        return amounts, times
+
+    def remember_yield(
+        self, real_price: float, annual_yield: float, settles_on: date
+    ) -> None:
+        if self._xirr_date != settles_on or len(self._xirr_cache) >= _XIRR_CACHE_SIZE:
+            self._xirr_cache.clear()
+            self._xirr_date = settles_on
+        self._xirr_cache[real_price] = annual_yield
+
+    def _xirr_yield(self, real_price: float, settles_on: date) -> float:
+        if self._xirr_date == settles_on and real_price in self._xirr_cache:
+            return self._xirr_cache[real_price]
+        annual_yield = float(xirr_yields([self], [real_price], settles_on)[0])
+        self.remember_yield(real_price, annual_yield, settles_on)
+        return annual_yield
+
+    def real_price_at(self, price_nano: int, settles_on: date | None = None) -> float:
+        current_price = self.nominal * nano_to_float(price_nano) / 100
+        commission = current_price * (self.commission_percent / 100)
+        return current_price + self.aci_at(settles_on) + commission
+
+    def at(self, price_nano: int, settles_on: date | None = None) -> PriceView:
+        settles_on = settles_on or settlement_date()
+        price_percent = nano_to_float(price_nano)
         current_price = (self.nominal * price_percent) / 100
         commission = current_price * (self.commission_percent / 100)
-        real_price = current_price + self.aci_value + commission
-        benefit = self.full_return - real_price
+        aci, coupons_sum = self._accrual_on(settles_on)
+        real_price = current_price + aci + commission
+        benefit = self.nominal + coupons_sum - real_price
 
         days = self.days_to_maturity
         if days <= 0 or real_price <= 0:
             annual_yield = 0.0
+        elif settings.YIELD_MODEL == "xirr":
+            annual_yield = self._xirr_yield(real_price, settles_on)
         else:
-            annual_yield = (benefit / real_price) * (365.25 / days) * 100
+            annual_yield = (benefit / real_price) * (DAYS_IN_YEAR / days) * 100
 
         return PriceView(
             price_percent=price_percent,
@@ -79,44 +218,59 @@ class EnrichedBond:
             annual_yield=annual_yield,
         )
 
+    @property
+    def is_normal_trading(self) -> bool:
+        return self.trading_status in _NORMAL_TRADING_STATUSES
+
+    @property
+    def has_quotes(self) -> bool:
+        return self.top.ask_price_nano > 0 or self.top.bid_price_nano > 0
+
+    @property
+    def ask_price_nano(self) -> int:
+        return self.top.ask_price_nano
+
     @property
     def ask_price_percent(self) -> float:
-        return to_float(self.orderbook.asks[0].price) if self.orderbook.asks else 0
+        return nano_to_float(self.ask_price_nano)
 
     @property
     def ask_quantity(self) -> int:
-        return self.orderbook.asks[0].quantity if self.orderbook.asks else 0
+        return self.top.ask_quantity
+
+    @property
+    def bid_price_nano(self) -> int:
+        return self.top.bid_price_nano
 
     @property
     def bid_price_percent(self) -> float:
-        return to_float(self.orderbook.bids[0].price) if self.orderbook.bids else 0
+        return nano_to_float(self.bid_price_nano)
 
     @property
     def bid_quantity(self) -> int:
-        return self.orderbook.bids[0].quantity if self.orderbook.bids else 0
+        return self.top.bid_quantity
 
     @property
     def ask(self) -> PriceView:
-        return self.at(self.ask_price_percent)
+        return self.at(self.ask_price_nano)
 
     @property
     def bid(self) -> PriceView:
-        return self.at(self.bid_price_percent)
+        return self.at(self.bid_price_nano)
 
     @classmethod
     def from_bond(
         cls,
         bond: Bond,
         commission_percent: float,
-        coupons_sum: float,
-        orderbook: OrderBook,
+        coupon_schedule: CouponSchedule,
     ) -> Self:
         return cls(
             name=bond.name,
             figi=bond.figi,
             ticker=bond.ticker,
             nominal=to_float(bond.nominal),
-            aci_value=to_float(bond.aci_value),
+            aci_snapshot=to_float(bond.aci_value),
             maturity_date=bond.maturity_date,
             risk_level=bond.risk_level,
             is_unlimited=bond.perpetual_flag,
@@ -125,10 +279,10 @@ class EnrichedBond:
             for_qual_investor=bond.for_qual_investor_flag,
             trading_status=bond.trading_status,
             commission_percent=commission_percent,
-            coupons_sum=coupons_sum,
-            min_price_increment=to_float(bond.min_price_increment),
-            orderbook=orderbook,
+            coupon_schedule=coupon_schedule,
+            min_price_increment_nano=to_nano(bond.min_price_increment),
+            top=TopOfBook.empty(bond.figi),
         )
 
-    def update(self, orderbook: OrderBook) -> None:
-        self.orderbook = orderbook
+    def update(self, top: TopOfBook) -> None:
+        self.top = top
@@ -0,0 +1,97 @@
+import asyncio
+from collections.abc import AsyncIterator, Mapping
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from src.market.bid_order_registry import BidOrderRegistry
+from src.market.domain import EnrichedBond
+
+
+@dataclass(frozen=True)
+class Exposure:
+    held: float
+    bid_reserved: float
+    in_flight: float
+    # the part of `in_flight` that is bids, which also counts against the bid cap
+    bid_in_flight: float
+
+    @property
+    def total(self) -> float:
+        return self.held + self.bid_reserved + self.in_flight
+
+
+def _add(values: dict[str, float], figi: str, value: float) -> None:
+    total = values.get(figi, 0.0) + value
+    if total > 1e-9:
+        values[figi] = total
+    else:
+        values.pop(figi, None)
+
+
+class ExposureLedger:
+    def __init__(self, bid_registry: BidOrderRegistry) -> None:
+        self._bid_registry = bid_registry
+        self._held: dict[str, float] = {}
+        self._in_flight: dict[str, float] = {}
+        self._bid_in_flight: dict[str, float] = {}
+        self._settled = asyncio.Event()
+        self._settled.set()
+        self._drained = asyncio.Event()
+        self._drained.set()
+
+    def exposure(self, bond: EnrichedBond) -> Exposure:
+        # resting bids are read straight from the registry, which is already updated
+        # under the registry lock on every place/replace/cancel/fill
+        bid_reserved = sum(
+            bond.real_price_at(o.price_nano) * o.quantity
+            for o in self._bid_registry.bids_for(bond.figi)
+        )
+        return Exposure(
+            held=self._held.get(bond.figi, 0.0),
+            bid_reserved=bid_reserved,
+            in_flight=self._in_flight.get(bond.figi, 0.0),
+            bid_in_flight=self._bid_in_flight.get(bond.figi, 0.0),
+        )
+
+    def add_held(self, figi: str, value: float) -> None:
+        self._held[figi] = self._held.get(figi, 0.0) + value
+
+    def add_in_flight(self, figi: str, value: float, bid: bool = False) -> None:
+        _add(self._in_flight, figi, value)
+        if bid:
+            _add(self._bid_in_flight, figi, value)
+        self._drained.clear()
+
+    def release_in_flight(self, figi: str, value: float, bid: bool = False) -> None:
+        _add(self._in_flight, figi, -value)
+        if bid:
+            _add(self._bid_in_flight, figi, -value)
+        if not self._in_flight:
+            self._drained.set()
+
+    async def wait_settled(self) -> None:
+        """
+        Holds a new order back while a reconcile is reading the broker's books; returns
+        without yielding otherwise, so sizing and reserving stay one synchronous step.
+        """
+        if not self._settled.is_set():
+            await self._settled.wait()
+
+    @asynccontextmanager
+    async def reconciling(self) -> AsyncIterator[None]:
+        """
+        Stops new orders and waits out the ones in flight, so the broker snapshot taken
+        inside already holds every order fill the ledger has recorded.
+        """
+        self._settled.clear()
+        try:
+            await self._drained.wait()
+            yield
+        finally:
+            self._settled.set()
+
+    def replace_held(self, held: Mapping[str, float]) -> None:
+        self._held = dict(held)
+
+    def __len__(self) -> int:
+        return len(self._held.keys() | self._in_flight.keys())
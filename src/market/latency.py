@@ -0,0 +1,51 @@
+import time
+
+from src.market.domain import TopOfBook
+from src.metrics import BOOK_RECEIVE_LAG_SECONDS, ORDER_LATENCY_SECONDS
+
+# exchange timestamps come from the exchange clock and receive/decision/send stamps
+# from ours, so the exchange-relative stages are only as good as local clock sync
+
+# exchange time of the newest message seen on the market-data stream, for any bond
+_stream_exchange_ts = 0.0
+
+
+def observe_stream_alive(exchange_ts: float) -> None:
+    global _stream_exchange_ts
+    _stream_exchange_ts = max(_stream_exchange_ts, exchange_ts)
+
+
+def observe_receive(top: TopOfBook) -> None:
+    if top.exchange_ts:
+        BOOK_RECEIVE_LAG_SECONDS.observe(top.received_ts - top.exchange_ts)
+    observe_stream_alive(top.exchange_ts or top.received_ts)
+
+
+def stream_lag_s(now: float | None = None) -> float | None:
+    """
+    How far the market-data stream is behind the exchange. Every book rides on the same
+    stream and the exchange only sends changes, so a quiet book is as current as the
+    stream itself; a book is stale only when the stream has fallen behind or gone
+    silent (it carries pings while no book changes).
+    """
+    if not _stream_exchange_ts:
+        return None
+    return (time.time() if now is None else now) - _stream_exchange_ts
+
+
+def mark_decision(strategy: str, top: TopOfBook) -> float:
+    decided_at = time.time()
+    if top.received_ts:
+        ORDER_LATENCY_SECONDS.observe(
+            decided_at - top.received_ts, strategy, "receive_to_decision"
+        )
+    return decided_at
+
+
+def mark_send(strategy: str, top: TopOfBook, decided_at: float) -> None:
+    sent_at = time.time()
+    ORDER_LATENCY_SECONDS.observe(sent_at - decided_at, strategy, "decision_to_send")
+    if top.exchange_ts:
+        ORDER_LATENCY_SECONDS.observe(
+            sent_at - top.exchange_ts, strategy, "exchange_to_send"
+        )
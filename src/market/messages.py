@@ -100,3 +100,13 @@ def compose_bid_fill_notification(
         remaining_balance=remaining_balance,
         reserved_balance=reserved_balance,
     )
+
+
+def compose_loop_health_notification(
+    loop: str, health: str, error: Exception | None
+) -> str:
+    if error is None and health == "RUNNING":
+        return f"Loop `{loop}` recovered\nHealth: {health}"
+    if error is None:
+        return f"Loop `{loop}` is {health}\nIt keeps returning right after starting"
+    return f"Loop `{loop}` is {health}\nError: {type(error).__name__}: {error}"
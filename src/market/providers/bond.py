@@ -1,28 +1,40 @@
 import asyncio
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Awaitable, Callable
 from datetime import datetime, timezone
 
 import structlog
-from t_tech.invest.grpc import AsyncClient  # type: ignore
 from t_tech.invest.grpc.schemas import (
     Bond,
+    InfoInstrument,
     MarketDataRequest,
     OrderBookInstrument,
     RiskLevel,
+    SecurityTradingStatus,
+    SubscribeInfoRequest,
     SubscribeOrderBookRequest,
     SubscriptionAction,
 )
 from t_tech.invest.grpc.utils.grpc_services import AsyncServices
 
 from src.config import settings
+from src.market.accrual import settlement_date
 from src.market.api import (
-    fetch_coupons_sum,
-    fetch_orderbook,
+    fetch_coupon_schedule,
+    fetch_last_prices,
     fetch_raw_bonds,
     fetch_user_commission,
 )
+from src.market.api.raw_market_data import stream_market_data
 from src.market.bond_catalog import BondCatalog
-from src.market.domain import EnrichedBond
+from src.market.book_history import BookHistoryRegistry
+from src.market.bootstrap import timed_step
+from src.market.catalog_snapshot import load_catalog_snapshot, save_catalog_snapshot
+from src.market.connection import BrokerConnection
+from src.market.domain import EnrichedBond, TopOfBook, TradingStatusUpdate
+from src.market.latency import observe_receive, observe_stream_alive
+from src.market.rejection_registry import RejectionRegistry
+from src.market.yield_engine import warm_yields
+from src.metrics import TICKS_COALESCED, TICKS_RECEIVED
 
 log = structlog.get_logger(__name__)
 
@@ -47,13 +59,66 @@ def _filter_bonds(bonds: list[Bond], maximum_days: int) -> list[Bond]:
     ]
 
 
+def _static_params(bond: EnrichedBond) -> tuple:
+    return (
+        bond.aci_snapshot,
+        tuple(bond.coupon_schedule.periods),
+        bond.maturity_date,
+        bond.nominal,
+        bond.commission_percent,
+        bond.min_price_increment_nano,
+    )
+
+
+def _status_name(status: int) -> str:
+    try:
+        return SecurityTradingStatus(status).name
+    except ValueError:
+        return str(status)
+
+
+def _request_subscription(
+    subscriptions: asyncio.Queue[tuple[SubscriptionAction, list[str]]],
+    action: SubscriptionAction,
+    figis: list[str],
+) -> None:
+    if not figis:
+        return
+    subscriptions.put_nowait((action, figis))
+    log.info(
+        "market_data_subscription_requested",
+        action=action.name,
+        count=len(figis),
+        raw_decoding=settings.RAW_ORDERBOOK_DECODING,
+    )
+
+
 class BondProvider:
-    def __init__(self, catalog: BondCatalog) -> None:
+    def __init__(
+        self,
+        catalog: BondCatalog,
+        connection: BrokerConnection,
+        book_history: BookHistoryRegistry,
+        rejection_registry: RejectionRegistry,
+        on_catalog_replaced: Callable[[list[EnrichedBond]], Awaitable[None]],
+    ) -> None:
         self._catalog = catalog
+        self._connection = connection
+        self._book_history = book_history
+        self._rejection_registry = rejection_registry
+        self._on_catalog_replaced = on_catalog_replaced
+        self._awaiting_snapshot: set[str] = set()
+        self._snapshots_complete = asyncio.Event()
+        self._prepared: tuple[list[EnrichedBond], bool] | None = None
+        self._subscriptions: asyncio.Queue[tuple[SubscriptionAction, list[str]]] = (
+            asyncio.Queue()
+        )
 
     async def _fetch_tradable_bonds(self, client: AsyncServices) -> list[EnrichedBond]:
-        user_commission = await fetch_user_commission(client)
-        raw_bonds = await fetch_raw_bonds(client)
+        user_commission, raw_bonds = await asyncio.gather(
+            timed_step("commission", fetch_user_commission(client)),
+            timed_step("instruments", fetch_raw_bonds(client)),
+        )
         log.info("bonds_fetched", count=len(raw_bonds))
 
         filtered = _filter_bonds(raw_bonds, maximum_days=settings.DAYS_TO_MATURITY_MAX)
@@ -63,78 +128,306 @@ class BondProvider:
             max_days_to_maturity=settings.DAYS_TO_MATURITY_MAX,
         )
 
-        coupon_sums = await asyncio.gather(
-            *[
-                fetch_coupons_sum(client, bond.figi, bond.maturity_date)
-                for bond in filtered
-            ]
-        )
-        orderbooks = await asyncio.gather(
-            *[fetch_orderbook(client, bond.figi) for bond in filtered]
+        coupon_schedules = await timed_step(
+            "coupon_schedules",
+            asyncio.gather(
+                *[
+                    fetch_coupon_schedule(client, bond.figi, bond.maturity_date)
+                    for bond in filtered
+                ]
+            ),
         )
 
+        # books start empty and are filled by the subscription's initial snapshots
         bonds = [
             EnrichedBond.from_bond(
                 bond,
                 commission_percent=user_commission,
-                coupons_sum=coupon_sum,
-                orderbook=orderbook,
+                coupon_schedule=coupon_schedule,
             )
-            for bond, coupon_sum, orderbook in zip(filtered, coupon_sums, orderbooks)
+            for bond, coupon_schedule in zip(filtered, coupon_schedules)
         ]
+        await self._save_snapshot(bonds)
         return bonds
 
-    async def stream(self) -> AsyncGenerator[EnrichedBond]:
+    async def _save_snapshot(self, bonds: list[EnrichedBond]) -> None:
+        if settings.CATALOG_SNAPSHOT_MAX_AGE_SECONDS <= 0:
+            return
+        try:
+            await asyncio.to_thread(
+                save_catalog_snapshot, settings.CATALOG_SNAPSHOT_PATH, bonds
+            )
+        except OSError:
+            log.exception(
+                "catalog_snapshot_save_failed", path=str(settings.CATALOG_SNAPSHOT_PATH)
+            )
+
+    async def _initial_catalog(self) -> tuple[list[EnrichedBond], bool]:
+        if settings.CATALOG_SNAPSHOT_MAX_AGE_SECONDS > 0:
+            bonds = await asyncio.to_thread(
+                load_catalog_snapshot,
+                settings.CATALOG_SNAPSHOT_PATH,
+                settings.CATALOG_SNAPSHOT_MAX_AGE_SECONDS,
+            )
+            if bonds is not None:
+                return bonds, True
+        return await self._fetch_tradable_bonds(self._connection.client), False
+
+    def _swap(
+        self, bonds: list[EnrichedBond]
+    ) -> tuple[list[EnrichedBond], list[str], list[str]]:
+        """
+        Installs the next catalog in one synchronous step, so no tick is ever applied
+        to a half-built one. Retained bonds keep the book and the trading status the
+        live stream has built, since they get no fresh subscription snapshot.
+        """
+        previous = {bond.figi: bond for bond in self._catalog.all()}
+        changed = []
+        for bond in bonds:
+            old = previous.get(bond.figi)
+            if old is None:
+                continue
+            if old.has_quotes:
+                bond.update(old.top)
+            bond.trading_status = old.trading_status
+            if _static_params(bond) != _static_params(old):
+                changed.append(bond)
+
+        if settings.YIELD_MODEL == "xirr":
+            warm_yields(bonds, settlement_date())
+
+        self._catalog.replace_all(bonds)
+        self._book_history.retain(bond.figi for bond in bonds)
+
+        current = {bond.figi for bond in bonds}
+        added = [figi for figi in current if figi not in previous]
+        removed = [figi for figi in previous if figi not in current]
+        return changed, added, removed
+
+    def _expect_snapshots(self, figis: list[str]) -> None:
+        self._awaiting_snapshot = set(figis)
+        self._snapshots_complete = asyncio.Event()
+        if not figis:
+            self._snapshots_complete.set()
+
+    async def _seed_books(self) -> None:
+        try:
+            async with asyncio.timeout(settings.ORDERBOOK_SNAPSHOT_TIMEOUT_SECONDS):
+                await self._snapshots_complete.wait()
+        except TimeoutError:
+            pass
+
+        missing = list(self._awaiting_snapshot)
+        self._awaiting_snapshot = set()
+        if not missing:
+            return
+
+        try:
+            last_prices = await fetch_last_prices(self._connection.client, missing)
+        except Exception:
+            log.exception(
+                "processing_failed", kind="last_price_seed", count=len(missing)
+            )
+            return
+        for figi, price_nano in last_prices.items():
+            bond = self._catalog.get(figi)
+            if bond is None or bond.has_quotes:
+                continue
+            bond.update(TopOfBook.from_last_price(figi, price_nano))
+            self._catalog.update_yields(bond)
+        log.info(
+            "orderbook_snapshots_missing",
+            count=len(missing),
+            seeded_from_last_price=len(last_prices),
+        )
+
+    async def prepare(self) -> None:
+        """
+        Builds the initial catalog ahead of `stream`, so it can run alongside the rest
+        of the session bootstrap.
+        """
+        self._prepared = await self._initial_catalog()
+
+    async def _refresh_periodically(
+        self,
+        initial: list[EnrichedBond],
+        from_snapshot: bool,
+    ) -> None:
+        await self._seed_books()
+        await self._on_catalog_replaced(initial)
+
+        # a catalog restored from the snapshot is validated by an immediate refresh
+        delay = 0 if from_snapshot else settings.BOND_REFRESH_INTERVAL_SECONDS
         while True:
-            async with AsyncClient(settings.TINVEST_TOKEN) as client:
-                bonds = await self._fetch_tradable_bonds(client)
+            await asyncio.sleep(delay)
+            delay = settings.BOND_REFRESH_INTERVAL_SECONDS
+            try:
+                bonds = await self._fetch_tradable_bonds(self._connection.client)
+            except Exception:
+                log.exception("processing_failed", kind="catalog_refresh")
+                continue
+
+            changed, added, removed = self._swap(bonds)
+            self._expect_snapshots(added)
+            _request_subscription(
+                self._subscriptions,
+                SubscriptionAction.SUBSCRIPTION_ACTION_UNSUBSCRIBE,
+                removed,
+            )
+            _request_subscription(
+                self._subscriptions,
+                SubscriptionAction.SUBSCRIPTION_ACTION_SUBSCRIBE,
+                added,
+            )
+            log.info(
+                "bond_catalog_swapped",
+                count=len(bonds),
+                added=len(added),
+                removed=len(removed),
+                changed=len(changed),
+            )
 
-                self._catalog.replace_all(bonds)
-                log.info("bond_catalog_replaced", count=len(bonds))
+            await self._seed_books()
+            added_figis = set(added)
+            affected = changed + [b for b in bonds if b.figi in added_figis]
+            if affected:
+                await self._on_catalog_replaced(affected)
 
-                for bond in bonds:
-                    yield bond
-                async for bond in self._stream_price_updates(client, bonds):
-                    yield bond
+    async def stream(self) -> AsyncGenerator[EnrichedBond]:
+        prepared, self._prepared = self._prepared, None
+        bonds, from_snapshot = prepared or await self._initial_catalog()
+        _, added, _ = self._swap(bonds)
+        log.info("bond_catalog_replaced", count=len(bonds), from_snapshot=from_snapshot)
+
+        self._expect_snapshots(added)
+
+        # the next catalog is built off to the side while this stream keeps trading on
+        # the current one; the stream is only torn down when it fails
+        refresher = asyncio.create_task(
+            self._refresh_periodically(bonds, from_snapshot),
+            name="bond_catalog_refresh",
+        )
+        try:
+            async for bond in self._stream_price_updates():
+                yield bond
+        finally:
+            refresher.cancel()
+
+    def _open_market_data(
+        self, client: AsyncServices
+    ) -> AsyncGenerator[TopOfBook | TradingStatusUpdate]:
+        # every stream, including one reopened after a reconnect, gets a fresh queue
+        # that starts by subscribing the whole current catalog; diffs still queued for
+        # the replaced stream are covered by that
+        self._subscriptions = asyncio.Queue()
+        _request_subscription(
+            self._subscriptions,
+            SubscriptionAction.SUBSCRIPTION_ACTION_SUBSCRIBE,
+            [bond.figi for bond in self._catalog.all()],
+        )
+        return self._stream_market_data(client, self._subscriptions)
+
+    async def _stream_market_data(
+        self,
+        client: AsyncServices,
+        subscriptions: asyncio.Queue[tuple[SubscriptionAction, list[str]]],
+    ) -> AsyncGenerator[TopOfBook | TradingStatusUpdate]:
+        if settings.RAW_ORDERBOOK_DECODING:
+            async for update in stream_market_data(client, subscriptions):
+                yield update
+            return
 
-    async def _stream_price_updates(
-        self, client: AsyncServices, bonds: list[EnrichedBond]
-    ) -> AsyncGenerator[EnrichedBond]:
         async def request_iterator():
-            yield MarketDataRequest(
-                subscribe_order_book_request=SubscribeOrderBookRequest(
-                    subscription_action=SubscriptionAction.SUBSCRIPTION_ACTION_SUBSCRIBE,
-                    instruments=[
-                        OrderBookInstrument(figi=b.figi, depth=1) for b in bonds
-                    ],
+            # every catalog change subscribes order books and trading statuses alike
+            while True:
+                action, figis = await subscriptions.get()
+                yield MarketDataRequest(
+                    subscribe_order_book_request=SubscribeOrderBookRequest(
+                        subscription_action=action,
+                        instruments=[
+                            OrderBookInstrument(figi=figi, depth=1) for figi in figis
+                        ],
+                    )
+                )
+                yield MarketDataRequest(
+                    subscribe_info_request=SubscribeInfoRequest(
+                        subscription_action=action,
+                        instruments=[InfoInstrument(figi=figi) for figi in figis],
+                    )
                 )
-            )
-            await asyncio.Event().wait()
 
-        log.info("orderbook_subscribed", count=len(bonds))
+        async for marketdata in client.market_data_stream.market_data_stream(
+            request_iterator()
+        ):
+            if marketdata.ping:
+                observe_stream_alive(marketdata.ping.time.timestamp())
+                continue
+            if marketdata.trading_status:
+                yield TradingStatusUpdate(
+                    figi=marketdata.trading_status.figi,
+                    trading_status=marketdata.trading_status.trading_status,
+                )
+                continue
+            if not marketdata.orderbook:
+                log.debug("market_data_skipped", reason="no_orderbook")
+                continue
+            yield TopOfBook.from_orderbook(marketdata.orderbook)
 
-        try:
-            async with asyncio.timeout(settings.BOND_REFRESH_INTERVAL_SECONDS):
-                async for marketdata in client.market_data_stream.market_data_stream(
-                    request_iterator()
-                ):
-                    if not marketdata.orderbook:
-                        log.debug("market_data_skipped", reason="no_orderbook")
-                        continue
-
-                    bond = self._catalog.get(marketdata.orderbook.figi)
-                    if not bond:
-                        log.debug(
-                            "price_update_skipped",
-                            figi=marketdata.orderbook.figi,
-                            reason="not_in_catalog",
-                        )
-                        continue
-
-                    before = (bond.ask.real_price, bond.bid.real_price)
-                    bond.update(marketdata.orderbook)
-
-                    if (bond.ask.real_price, bond.bid.real_price) != before:
-                        yield bond
-        except TimeoutError:
-            log.info("bond_refresh_interval_reached")
+    def _apply_trading_status(self, update: TradingStatusUpdate) -> EnrichedBond | None:
+        bond = self._catalog.get(update.figi)
+        if bond is None or bond.trading_status == update.trading_status:
+            return None
+        log.info(
+            "trading_status_changed",
+            figi=bond.figi,
+            ticker=bond.ticker,
+            previous=_status_name(bond.trading_status),
+            trading_status=_status_name(update.trading_status),
+        )
+        bond.trading_status = update.trading_status
+        # whatever the broker refused the bond for may no longer hold
+        self._rejection_registry.clear(bond.figi)
+        # a bond back in normal trading is evaluated at once at its current book
+        return bond if bond.is_normal_trading and bond.has_quotes else None
+
+    async def _stream_price_updates(self) -> AsyncGenerator[EnrichedBond]:
+        async for update in self._connection.stream(
+            "market_data", self._open_market_data
+        ):
+            if isinstance(update, TradingStatusUpdate):
+                if bond := self._apply_trading_status(update):
+                    yield bond
+                continue
+
+            top = update
+            bond = self._catalog.get(top.figi)
+            if not bond:
+                log.debug(
+                    "price_update_skipped",
+                    figi=top.figi,
+                    reason="not_in_catalog",
+                )
+                continue
+
+            TICKS_RECEIVED.inc(top.figi)
+            observe_receive(top)
+            self._book_history.record(top)
+            before = (bond.ask_price_nano, bond.bid_price_nano)
+            bond.update(top)
+            changed = (bond.ask_price_nano, bond.bid_price_nano) != before
+            if changed:
+                self._catalog.update_yields(bond)
+
+            if top.figi in self._awaiting_snapshot:
+                # the first book only fills the catalog in: the allocator ranks all the
+                # bonds once the snapshots are in, instead of the balance going to
+                # whichever bond's snapshot happens to arrive first
+                self._awaiting_snapshot.discard(top.figi)
+                if not self._awaiting_snapshot:
+                    self._snapshots_complete.set()
+                continue
+
+            if not changed:
+                TICKS_COALESCED.inc(top.figi)
+                continue
+            yield bond
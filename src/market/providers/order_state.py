@@ -2,28 +2,31 @@ from collections.abc import AsyncGenerator
 
 import structlog
 
-from t_tech.invest.grpc import AsyncClient  # type: ignore
 from t_tech.invest.grpc.schemas import (
     OrderStateStreamRequest,
     OrderStateStreamResponse,
 )
 
-from src.config import settings
+from src.market.connection import BrokerConnection
 
 log = structlog.get_logger(__name__)
 
 
 class OrderStateProvider:
-    def __init__(self, account_id: str) -> None:
+    def __init__(self, connection: BrokerConnection, account_id: str) -> None:
+        self._connection = connection
         self._account_id = account_id
 
     async def stream(self) -> AsyncGenerator[OrderStateStreamResponse.OrderState]:
-        async with AsyncClient(settings.TINVEST_TOKEN) as client:
-            request = OrderStateStreamRequest(accounts=[self._account_id])
-            log.info("order_state_stream_subscribed")
-            async for response in client.orders_stream.order_state_stream(
-                request=request
-            ):
-                if response.order_state is None:
-                    continue
-                yield response.order_state
+        request = OrderStateStreamRequest(accounts=[self._account_id])
+        log.info("order_state_stream_subscribed")
+        # fills are rare, so the stream is moved to a new channel as soon as there is
+        # one rather than on its next message
+        async for response in self._connection.stream(
+            "order_state",
+            lambda client: client.orders_stream.order_state_stream(request=request),
+            quiet=True,
+        ):
+            if response.order_state is None:
+                continue
+            yield response.order_state
@@ -0,0 +1,41 @@
+import time
+from collections.abc import Mapping
+
+
+class RejectionRegistry:
+    """
+    Remembers bonds the broker refused orders for, per error code, so they are left out
+    of strategy evaluation until the entry expires instead of costing an order RPC on
+    every tick.
+    """
+
+    def __init__(self, ttl_by_code: Mapping[str, float]) -> None:
+        self._ttl_by_code = dict(ttl_by_code)
+        self._until: dict[tuple[str, str], float] = {}
+
+    def record(self, figi: str, code: str) -> bool:
+        ttl = self._ttl_by_code.get(code, 0)
+        if ttl <= 0:
+            return False
+        self._until[(figi, code)] = time.monotonic() + ttl
+        return True
+
+    def rejected(self, figi: str) -> str | None:
+        """Returns the error code the bond is still suppressed for, if any."""
+        now = time.monotonic()
+        for code in self._ttl_by_code:
+            until = self._until.get((figi, code))
+            if until is None:
+                continue
+            if now < until:
+                return code
+            # expired entries go on the bond's next tick, which keeps the map bounded
+            del self._until[(figi, code)]
+        return None
+
+    def clear(self, figi: str) -> None:
+        for code in self._ttl_by_code:
+            self._until.pop((figi, code), None)
+
+    def __len__(self) -> int:
+        return len(self._until)
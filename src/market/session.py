@@ -1,66 +1,93 @@
 import asyncio
+import time
 
 import structlog
-from t_tech.invest.grpc import AsyncClient  # type: ignore
+from t_tech.invest.grpc.schemas import OrderState
 from t_tech.invest.grpc.utils.grpc_services import AsyncServices
 
 from src.config import settings
-from src.market.api import fetch_account_id, fetch_active_bid_orders
+from src.market.api import (
+    fetch_account_id,
+    fetch_active_bid_orders,
+    fetch_bond_positions,
+)
+from src.market.api.order_errors import INSTRUMENT_NOT_TRADABLE
+from src.market.balance_limited_registry import BalanceLimitedRegistry
 from src.market.bid_order_registry import ActiveBidOrder, BidOrderRegistry
 from src.market.bond_catalog import BondCatalog
+from src.market.book_history import BookHistoryRegistry
+from src.market.bootstrap import timed_step
+from src.market.connection import BrokerConnection
 from src.market.context import MarketContext
 from src.market.cooldown_registry import CooldownRegistry
-from src.market.domain import MaturityEventType
+from src.market.domain import EnrichedBond, MaturityEventType
+from src.market.exposure_ledger import ExposureLedger
 from src.market.providers import BondProvider, MaturityProvider, OrderStateProvider
+from src.market.rejection_registry import RejectionRegistry
+from src.market.supervisor import LoopPolicy, LoopSupervisor
 from src.market.use_cases import (
+    allocate_cash_inflow,
+    allocate_catalog,
     process_ask_sniper,
     process_bid_order_state,
     process_bid_waiter,
     process_maturity,
-    refresh_all_bids,
 )
-from src.market.utils import to_float
+from src.market.utils import to_float, to_nano
+from src.loop_watchdog import watch_loop_lag
+from src.memory_diagnostics import MemoryDiagnostics, rss_bytes
+from src.metrics import (
+    PROCESS_RSS_BYTES,
+    REGISTRY_SIZE,
+    STRATEGY_SECONDS,
+    serve_metrics,
+)
+from src.profiler import install_profile_trigger
 from src.stats import MaturityRepository, PurchaseRepository
+from src.tracing import span
 
 log = structlog.get_logger(__name__)
 
+_CASH_INFLOW_EVENTS = {MaturityEventType.REPAYMENT, MaturityEventType.COUPON}
 
-async def _with_retry(fn, *args, on_retry=None, **kwargs) -> None:
-    retrying = False
-    while True:
-        try:
-            if retrying and on_retry is not None:
-                await on_retry()
-            await fn(*args, **kwargs)
-        except Exception:
-            log.exception(
-                "processing_failed",
-                kind="loop",
-                loop=fn.__name__,
-                will_retry_in_seconds=300,
-            )
-            await asyncio.sleep(300)
-        retrying = True
+
+def _replace_bids(bid_registry: BidOrderRegistry, orders: list[OrderState]) -> None:
+    bid_registry.replace_all(
+        ActiveBidOrder(
+            order_id=order.order_id,
+            figi=order.figi,
+            price_nano=to_nano(order.initial_security_price),
+            quantity=order.lots_requested - order.lots_executed,
+        )
+        for order in orders
+    )
 
 
-async def _sync_bid_registry_from_broker(
+async def _reconcile_exposure_from_broker(
     client: AsyncServices,
     account_id: str,
+    exposure: ExposureLedger,
     bid_registry: BidOrderRegistry,
     bid_registry_lock: asyncio.Lock,
 ) -> None:
-    async with bid_registry_lock:
-        existing = await fetch_active_bid_orders(client, account_id)
-        bid_registry.replace_all(
-            ActiveBidOrder(
-                order_id=order.order_id,
-                figi=order.figi,
-                price_percent=to_float(order.initial_security_price),
-                quantity=order.lots_requested - order.lots_executed,
-            )
-            for order in existing
+    # no order is out and no order-state event is applied while the snapshot is taken
+    async with exposure.reconciling(), bid_registry_lock:
+        positions, existing = await asyncio.gather(
+            fetch_bond_positions(client, account_id),
+            fetch_active_bid_orders(client, account_id),
+        )
+        # resting bids are resynced from the same snapshot: order-state events applied
+        # later are diffed against these remaining lots, so a fill the positions
+        # already hold is not added again (the broker offers no atomic read of both,
+        # so a fill landing between the two concurrent reads is the one exception)
+        _replace_bids(bid_registry, existing)
+        exposure.replace_held(
+            {
+                figi: to_float(position.quantity) * to_float(position.current_price)
+                for figi, position in positions.items()
+            }
         )
-    log.info("bid_registry_synced", count=len(existing))
+    log.info("exposure_reconciled", count=len(positions), bids=len(existing))
 
 
 async def start_market_session() -> None:
@@ -69,33 +96,90 @@ async def start_market_session() -> None:
     bid_registry = BidOrderRegistry()
     bid_registry_lock = asyncio.Lock()
     catalog = BondCatalog()
-    cooldown_registry = CooldownRegistry()
+    book_history = BookHistoryRegistry()
+    cooldown_registry = CooldownRegistry(
+        max(settings.ASK_COOLDOWN_SECONDS, settings.BID_COOLDOWN_SECONDS)
+    )
+    rejection_registry = RejectionRegistry(
+        {INSTRUMENT_NOT_TRADABLE: settings.NOT_TRADABLE_RETRY_AFTER_SECONDS}
+    )
+    exposure = ExposureLedger(bid_registry)
+    balance_limited = BalanceLimitedRegistry()
 
-    async with AsyncClient(settings.TINVEST_TOKEN) as client:
-        account_id = await fetch_account_id(client)
+    started = time.monotonic()
+    async with BrokerConnection(settings.TINVEST_TOKEN) as connection:
 
-        await _sync_bid_registry_from_broker(
-            client, account_id, bid_registry, bid_registry_lock
+        async def allocate_after_refresh(bonds: list[EnrichedBond]) -> None:
+            try:
+                await allocate_catalog(ctx, bonds)
+            except Exception:
+                log.exception("processing_failed", kind="allocation")
+
+        bond_provider = BondProvider(
+            catalog,
+            connection,
+            book_history,
+            rejection_registry,
+            on_catalog_replaced=allocate_after_refresh,
+        )
+
+        async def bootstrap_account() -> str:
+            account_id = await timed_step(
+                "account", fetch_account_id(connection.client)
+            )
+            await timed_step(
+                "positions_and_bids",
+                _reconcile_exposure_from_broker(
+                    connection.client,
+                    account_id,
+                    exposure,
+                    bid_registry,
+                    bid_registry_lock,
+                ),
+            )
+            return account_id
+
+        # the catalog doesn't depend on the account, so both chains run side by side
+        account_id, _ = await asyncio.gather(
+            bootstrap_account(), timed_step("catalog", bond_provider.prepare())
         )
 
         ctx = MarketContext(
-            client=client,
+            connection=connection,
             account_id=account_id,
             bid_registry=bid_registry,
             bid_registry_lock=bid_registry_lock,
             catalog=catalog,
+            book_history=book_history,
             cooldown_registry=cooldown_registry,
+            rejection_registry=rejection_registry,
+            exposure=exposure,
+            balance_limited=balance_limited,
             purchase_repo=purchase_repo,
             maturity_repo=maturity_repo,
         )
+        registries = {
+            "catalog": catalog,
+            "bid_orders": bid_registry,
+            "book_history": book_history,
+            "cooldowns": cooldown_registry,
+            "rejections": rejection_registry,
+            "exposure": exposure,
+            "balance_limited": balance_limited,
+        }
+        for name, registry in registries.items():
+            REGISTRY_SIZE.set_function(registry.__len__, name)
+        PROCESS_RSS_BYTES.set_function(lambda: rss_bytes() or 0)
 
-        bond_provider = BondProvider(catalog)
-        maturity_provider = MaturityProvider(account_id)
-        order_state_provider = OrderStateProvider(account_id)
+        memory = MemoryDiagnostics(registries)
+        debug_routes = memory.install() if settings.MEMORY_DIAGNOSTICS_ENABLED else {}
+
+        maturity_provider = MaturityProvider(connection, account_id)
+        order_state_provider = OrderStateProvider(connection, account_id)
 
         async def bond_loop():
             async for bond in bond_provider.stream():
-                if not bond.orderbook.asks and not bond.orderbook.bids:
+                if not bond.has_quotes:
                     log.debug(
                         "tick_skipped",
                         figi=bond.figi,
@@ -103,9 +187,29 @@ async def start_market_session() -> None:
                         reason="empty_orderbook",
                     )
                     continue
+                if code := rejection_registry.rejected(bond.figi):
+                    log.debug(
+                        "tick_skipped",
+                        figi=bond.figi,
+                        ticker=bond.ticker,
+                        reason="rejected_by_broker",
+                        code=code,
+                    )
+                    continue
+                if not bond.is_normal_trading:
+                    log.debug(
+                        "tick_skipped",
+                        figi=bond.figi,
+                        ticker=bond.ticker,
+                        reason="not_normal_trading",
+                    )
+                    continue
                 try:
-                    await process_ask_sniper(ctx, bond)
-                    await process_bid_waiter(ctx, bond)
+                    with span("tick", figi=bond.figi, ticker=bond.ticker):
+                        with span("ask_sniper"), STRATEGY_SECONDS.time("ask_sniper"):
+                            await process_ask_sniper(ctx, bond)
+                        with span("bid_waiter"), STRATEGY_SECONDS.time("bid_waiter"):
+                            await process_bid_waiter(ctx, bond)
                 except Exception:
                     log.exception(
                         "processing_failed",
@@ -118,8 +222,8 @@ async def start_market_session() -> None:
             async for event in maturity_provider.stream():
                 try:
                     await process_maturity(ctx, event)
-                    if event.event_type == MaturityEventType.REPAYMENT:
-                        await refresh_all_bids(ctx)
+                    if event.event_type in _CASH_INFLOW_EVENTS:
+                        await allocate_cash_inflow(ctx)
                 except Exception:
                     log.exception(
                         "processing_failed",
@@ -137,19 +241,61 @@ async def start_market_session() -> None:
                         "processing_failed", kind="order_state", order_id=event.order_id
                     )
 
-        async def resync_bid_registry():
-            await _sync_bid_registry_from_broker(
-                client, account_id, bid_registry, bid_registry_lock
+        # bids are only resynced together with the held values: a fill is then either in
+        # the positions already or diffed against remaining lots that still include it
+        async def reconcile_exposure():
+            await _reconcile_exposure_from_broker(
+                connection.client,
+                account_id,
+                exposure,
+                bid_registry,
+                bid_registry_lock,
             )
 
-        async def bid_registry_sync_loop():
+        async def exposure_reconcile_loop():
             while True:
-                await asyncio.sleep(settings.BID_REGISTRY_SYNC_INTERVAL_SECONDS)
-                await resync_bid_registry()
+                await asyncio.sleep(settings.EXPOSURE_RECONCILE_INTERVAL_SECONDS)
+                await reconcile_exposure()
+
+        async def connection_health_loop():
+            await connection.maintain(settings.BROKER_HEALTHCHECK_INTERVAL_SECONDS)
+
+        # the catalog is already built, so the bond loop's first step is the order-book
+        # subscription: this is the time to first subscription
+        log.info(
+            "bootstrap_finished",
+            duration_ms=round((time.monotonic() - started) * 1000),
+        )
+
+        async def metrics_server_loop():
+            await serve_metrics(
+                settings.METRICS_HOST, settings.METRICS_PORT, debug_routes
+            )
+
+        async def memory_log_loop():
+            await memory.log_periodically(settings.MEMORY_LOG_INTERVAL_SECONDS)
+
+        # the metrics port being taken will not fix itself within seconds
+        slow_retry = LoopPolicy(initial_backoff_s=5.0, max_backoff_s=300.0)
+        supervisors = [
+            LoopSupervisor("bond_loop", bond_loop),
+            LoopSupervisor("maturity_loop", maturity_loop),
+            LoopSupervisor(
+                "order_state_loop", order_state_loop, on_retry=reconcile_exposure
+            ),
+            LoopSupervisor("exposure_reconcile_loop", exposure_reconcile_loop),
+            LoopSupervisor("connection_health_loop", connection_health_loop),
+            LoopSupervisor("loop_watchdog", watch_loop_lag),
+        ]
+        if settings.METRICS_ENABLED:
+            supervisors.append(
+                LoopSupervisor("metrics_server_loop", metrics_server_loop, slow_retry)
+            )
+        if settings.MEMORY_LOG_INTERVAL_SECONDS > 0:
+            supervisors.append(LoopSupervisor("memory_log_loop", memory_log_loop))
 
+        install_profile_trigger()
+        # named so the profiler's per-task breakdown can tell the loops apart
         await asyncio.gather(
-            _with_retry(bond_loop),
-            _with_retry(maturity_loop),
-            _with_retry(order_state_loop, on_retry=resync_bid_registry),
-            _with_retry(bid_registry_sync_loop),
+            *(asyncio.create_task(sv.run(), name=sv.name) for sv in supervisors)
         )
@@ -0,0 +1,188 @@
+import asyncio
+import random
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from enum import StrEnum
+
+import grpc
+import structlog
+from t_tech.invest.exceptions import AioRequestError
+
+from src.market.messages import compose_loop_health_notification
+from src.metrics import LOOP_HEALTH, LOOP_RESTARTS
+from src.telegram import notify
+
+log = structlog.get_logger(__name__)
+
+_TRANSIENT_STATUS_CODES = {
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.ABORTED,
+    grpc.StatusCode.INTERNAL,
+    grpc.StatusCode.CANCELLED,
+}
+_FATAL_STATUS_CODES = {
+    grpc.StatusCode.UNAUTHENTICATED,
+    grpc.StatusCode.PERMISSION_DENIED,
+}
+
+
+class LoopHealth(StrEnum):
+    STARTING = "STARTING"
+    RUNNING = "RUNNING"
+    BACKING_OFF = "BACKING_OFF"
+    CIRCUIT_OPEN = "CIRCUIT_OPEN"
+    FAILED = "FAILED"
+
+
+class ErrorKind(StrEnum):
+    TRANSIENT = "transient"
+    UNKNOWN = "unknown"
+    FATAL = "fatal"
+
+
+def classify_error(e: Exception) -> ErrorKind:
+    if isinstance(e, AioRequestError):
+        if e.code in _FATAL_STATUS_CODES:
+            return ErrorKind.FATAL
+        if e.code in _TRANSIENT_STATUS_CODES:
+            return ErrorKind.TRANSIENT
+        return ErrorKind.UNKNOWN
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return ErrorKind.TRANSIENT
+    return ErrorKind.UNKNOWN
+
+
+@dataclass(frozen=True)
+class LoopPolicy:
+    initial_backoff_s: float = 0.5
+    max_backoff_s: float = 60.0
+    multiplier: float = 2.0
+    jitter: float = 0.2
+    # a run that lasted this long counts as recovered and resets the failure streak
+    healthy_after_s: float = 60.0
+    # consecutive failures that open the circuit, and how long it stays open
+    breaker_threshold: int = 5
+    breaker_cooldown_s: float = 300.0
+    # stop for good on fatal errors (bad token, revoked access) instead of retrying
+    stop_on_fatal: bool = True
+
+
+class LoopSupervisor:
+    """
+    Keeps one session loop running: restarts it with jittered exponential backoff,
+    opens a circuit after repeated failures, and reports every health change.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[], Awaitable[None]],
+        policy: LoopPolicy = LoopPolicy(),
+        on_retry: Callable[[], Awaitable[None]] | None = None,
+    ) -> None:
+        self.name = name
+        self._fn = fn
+        self._policy = policy
+        self._on_retry = on_retry
+        self._failures = 0
+        self.health = LoopHealth.STARTING
+        self._set_health(LoopHealth.STARTING)
+
+    def _set_health(self, health: LoopHealth) -> None:
+        for state in LoopHealth:
+            LOOP_HEALTH.set(1.0 if state == health else 0.0, self.name, state.value)
+        if health != self.health:
+            log.info(
+                "loop_health_changed",
+                loop=self.name,
+                previous=self.health.value,
+                health=health.value,
+            )
+        self.health = health
+
+    async def _notify(self, error: Exception | None = None) -> None:
+        await notify(compose_loop_health_notification(self.name, self.health, error))
+
+    def _backoff_s(self) -> float:
+        p = self._policy
+        delay = p.initial_backoff_s * p.multiplier ** (self._failures - 1)
+        return min(delay, p.max_backoff_s) * random.uniform(1 - p.jitter, 1 + p.jitter)
+
+    async def _confirm_healthy(self, recovering: bool) -> None:
+        await asyncio.sleep(self._policy.healthy_after_s)
+        self._failures = 0
+        if recovering:
+            log.info("loop_recovered", loop=self.name)
+            await self._notify()
+
+    async def _back_off(self, error: Exception | None) -> float:
+        if self._failures >= self._policy.breaker_threshold:
+            was_open = self.health == LoopHealth.CIRCUIT_OPEN
+            self._set_health(LoopHealth.CIRCUIT_OPEN)
+            if not was_open:
+                await self._notify(error)
+            return self._policy.breaker_cooldown_s
+        self._set_health(LoopHealth.BACKING_OFF)
+        return self._backoff_s()
+
+    async def run(self) -> None:
+        retrying = False
+        while True:
+            recovering = self.health == LoopHealth.CIRCUIT_OPEN
+            confirm = None
+            try:
+                if retrying and self._on_retry is not None:
+                    await self._on_retry()
+                self._set_health(LoopHealth.RUNNING)
+                confirm = asyncio.create_task(self._confirm_healthy(recovering))
+                started = time.monotonic()
+                await self._fn()
+            except Exception as e:
+                self._failures += 1
+                kind = classify_error(e)
+                LOOP_RESTARTS.inc(self.name)
+
+                if kind == ErrorKind.FATAL and self._policy.stop_on_fatal:
+                    log.exception(
+                        "processing_failed",
+                        kind="loop",
+                        loop=self.name,
+                        error_kind=kind.value,
+                    )
+                    self._set_health(LoopHealth.FAILED)
+                    await self._notify(e)
+                    return
+
+                delay = await self._back_off(e)
+                log.exception(
+                    "processing_failed",
+                    kind="loop",
+                    loop=self.name,
+                    error_kind=kind.value,
+                    consecutive_failures=self._failures,
+                    will_retry_in_seconds=round(delay, 3),
+                )
+            else:
+                # a loop returning on its own (a stream the server closed) is restarted;
+                # one that keeps returning right after starting backs off like a failure
+                if time.monotonic() - started >= self._policy.healthy_after_s:
+                    self._failures = 0
+                    delay = self._policy.initial_backoff_s
+                else:
+                    self._failures += 1
+                    LOOP_RESTARTS.inc(self.name)
+                    delay = await self._back_off(None)
+                    log.warning(
+                        "loop_returned_early",
+                        loop=self.name,
+                        consecutive_failures=self._failures,
+                        will_retry_in_seconds=round(delay, 3),
+                    )
+            finally:
+                if confirm is not None:
+                    confirm.cancel()
+            await asyncio.sleep(delay)
+            retrying = True
@@ -1,15 +1,16 @@
+from .allocator import allocate_cash_inflow, allocate_catalog
 from .ask_sniper import process_ask_sniper
 from .bid_waiter import (
     process_bid_waiter,
     process_bid_order_state,
-    refresh_all_bids,
 )
 from .maturity import process_maturity
 
 __all__ = [
+    "allocate_cash_inflow",
+    "allocate_catalog",
     "process_ask_sniper",
     "process_bid_waiter",
     "process_maturity",
     "process_bid_order_state",
-    "refresh_all_bids",
 ]
@@ -0,0 +1,161 @@
+import asyncio
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import structlog
+
+from src.config import settings
+from src.market.api import fetch_account_balance_rub
+from src.market.cash_budget import CashBudget
+from src.market.context import MarketContext
+from src.market.domain import EnrichedBond
+from src.stats.models import PurchaseStrategy
+
+from .ask_sniper import process_ask_sniper
+from .bid_waiter import process_bid_waiter
+
+log = structlog.get_logger(__name__)
+
+_ALLOCATION_CONCURRENCY = 4
+
+
+@dataclass(frozen=True)
+class _Opportunity:
+    bond: EnrichedBond
+    strategy: PurchaseStrategy
+    annual_yield: float
+    liquidity: float
+
+
+def _ask_opportunity(ctx: MarketContext, bond: EnrichedBond) -> _Opportunity | None:
+    ask = bond.ask
+    if bond.ask_quantity <= 0 or ask.real_price <= 0:
+        return None
+    if not (
+        settings.ASK_MIN_ANNUAL_YIELD <= ask.annual_yield <= settings.ASK_MAX_ANNUAL_YIELD
+    ):
+        return None
+    headroom = settings.TOTAL_MAX_SUM_PER_BOND - ctx.exposure.exposure(bond).total
+    liquidity = min(
+        ask.real_price * bond.ask_quantity, settings.ASK_MAX_SUM_PER_PURCHASE, headroom
+    )
+    if liquidity < ask.real_price:
+        return None
+    return _Opportunity(bond, PurchaseStrategy.ASK_SNIPER, ask.annual_yield, liquidity)
+
+
+def _bid_opportunity(ctx: MarketContext, bond: EnrichedBond) -> _Opportunity | None:
+    bid = bond.bid
+    # a resting bid is always re-evaluated, it may have to be resized or cancelled
+    if ctx.bid_registry.bids_for(bond.figi):
+        return _Opportunity(bond, PurchaseStrategy.BID_WAITER, bid.annual_yield, 0.0)
+    # our bid goes one increment above the top bid, so its yield can only be lower;
+    # the upper bound is left for process_bid_waiter to check against the real target
+    if bond.bid_price_nano <= 0 or bid.real_price <= 0:
+        return None
+    if bid.annual_yield < settings.BID_MIN_ANNUAL_YIELD:
+        return None
+    exposure = ctx.exposure.exposure(bond)
+    headroom = min(
+        settings.BID_MAX_SUM_PER_BOND,
+        settings.TOTAL_MAX_SUM_PER_BOND - exposure.held - exposure.in_flight,
+    )
+    if headroom < bid.real_price:
+        return None
+    return _Opportunity(bond, PurchaseStrategy.BID_WAITER, bid.annual_yield, headroom)
+
+
+def _rank(
+    ctx: MarketContext,
+    bonds: Iterable[EnrichedBond],
+    bid_figis: set[str] | None,
+) -> list[_Opportunity]:
+    opportunities = []
+    for bond in bonds:
+        if bond.ticker in settings.BLACK_LISTED_TICKERS:
+            continue
+        if not bond.is_normal_trading or ctx.rejection_registry.rejected(bond.figi):
+            continue
+        if ask := _ask_opportunity(ctx, bond):
+            opportunities.append(ask)
+        if bid_figis is not None and bond.figi not in bid_figis:
+            continue
+        if bid := _bid_opportunity(ctx, bond):
+            opportunities.append(bid)
+    opportunities.sort(key=lambda o: (o.annual_yield, o.liquidity), reverse=True)
+    return opportunities
+
+
+async def _allocate(
+    ctx: MarketContext,
+    bonds: Iterable[EnrichedBond],
+    reason: str,
+    bid_figis: set[str] | None = None,
+) -> None:
+    opportunities = _rank(ctx, bonds, bid_figis)
+    if not opportunities:
+        log.info("capital_allocation_skipped", reason=reason, cause="no_opportunities")
+        return
+
+    balance = await fetch_account_balance_rub(ctx.client, ctx.account_id)
+    if balance.available is None:
+        log.info("capital_allocation_skipped", reason=reason, cause="no_balance")
+        return
+    budget = CashBudget(balance.available)
+    log.info(
+        "capital_allocation_started",
+        reason=reason,
+        count=len(opportunities),
+        available_balance=balance.available,
+        best_yield=opportunities[0].annual_yield,
+    )
+
+    # tasks take the semaphore in creation order and size their orders before their
+    # first await, so the shared budget is spent best yield first
+    semaphore = asyncio.Semaphore(_ALLOCATION_CONCURRENCY)
+
+    async def act(opportunity: _Opportunity) -> None:
+        bond = opportunity.bond
+        async with semaphore:
+            try:
+                if opportunity.strategy == PurchaseStrategy.ASK_SNIPER:
+                    await process_ask_sniper(ctx, bond, budget)
+                else:
+                    await process_bid_waiter(ctx, bond, budget)
+            except Exception:
+                log.exception(
+                    "processing_failed",
+                    kind="allocation",
+                    strategy=opportunity.strategy.value,
+                    figi=bond.figi,
+                    ticker=bond.ticker,
+                )
+
+    await asyncio.gather(*(act(o) for o in opportunities))
+    log.info(
+        "capital_allocation_finished",
+        reason=reason,
+        remaining_budget=budget.available,
+    )
+
+
+async def allocate_catalog(ctx: MarketContext, bonds: Iterable[EnrichedBond]) -> None:
+    await _allocate(ctx, bonds, reason="catalog_refresh")
+
+
+async def allocate_cash_inflow(ctx: MarketContext) -> None:
+    # incoming cash only changes bids that were sized down by the balance, or bonds we
+    # couldn't afford to bid on at all; resting bids limited by caps stay as they are.
+    # Candidates come from the catalog's yield indexes instead of pricing every bond
+    asks = ctx.catalog.asks_yielding_at_least(settings.ASK_MIN_ANNUAL_YIELD)
+    resting = ctx.bid_registry.figis()
+    bid_figis = ctx.balance_limited.figis() | {
+        bond.figi
+        for bond in ctx.catalog.bids_yielding_at_least(settings.BID_MIN_ANNUAL_YIELD)
+        if bond.figi not in resting
+    }
+    bonds = {bond.figi: bond for bond in asks}
+    for figi in bid_figis - bonds.keys():
+        if bond := ctx.catalog.get(figi):
+            bonds[figi] = bond
+    await _allocate(ctx, bonds.values(), reason="cash_inflow", bid_figis=bid_figis)
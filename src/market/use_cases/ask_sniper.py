@@ -2,20 +2,20 @@ from datetime import datetime, timezone
 
 import structlog
 
-from t_tech.invest.grpc.schemas import PortfolioPosition
-
 from src.config import settings
+from src.log_setup import Lazy
 from src.market.api import (
     buy_at_ask,
     fetch_account_balance_rub,
-    fetch_bond_positions,
     fetch_tmon_etf_price_at,
 )
-from src.market.bid_order_registry import BidOrderRegistry
+from src.market.cash_budget import CashBudget
 from src.market.context import MarketContext
 from src.market.domain import EnrichedBond
+from src.market.exposure_ledger import ExposureLedger
+from src.market.latency import mark_decision, mark_send, stream_lag_s
 from src.market.messages import compose_ask_snipe_notification
-from src.market.utils import to_float
+from src.metrics import ORDER_OUTCOMES
 from src.stats.models import PurchaseStrategy
 from src.telegram import notify
 
@@ -44,7 +44,7 @@ def _is_eligible_for_snipe(bond: EnrichedBond) -> bool:
             figi=bond.figi,
             ticker=bond.ticker,
             reason="yield_out_of_range",
-            annual_yield=bond.ask.annual_yield,
+            annual_yield=Lazy(lambda: bond.ask.annual_yield),
             ask_min_annual_yield=settings.ASK_MIN_ANNUAL_YIELD,
             ask_max_annual_yield=settings.ASK_MAX_ANNUAL_YIELD,
         )
@@ -57,7 +57,7 @@ def _is_eligible_for_snipe(bond: EnrichedBond) -> bool:
             figi=bond.figi,
             ticker=bond.ticker,
             reason="non_positive_ask_price",
-            ask_real_price=bond.ask.real_price,
+            ask_real_price=Lazy(lambda: bond.ask.real_price),
         )
         return False
 
@@ -67,23 +67,12 @@ def _is_eligible_for_snipe(bond: EnrichedBond) -> bool:
 def _compute_purchase_quantity(
     bond: EnrichedBond,
     balance: float,
-    existing_position: PortfolioPosition | None,
-    bid_registry: BidOrderRegistry,
+    exposure_ledger: ExposureLedger,
 ) -> int:
     qty_by_purchase_cap = int(settings.ASK_MAX_SUM_PER_PURCHASE // bond.ask.real_price)
 
-    if existing_position:
-        current_value = to_float(existing_position.quantity) * to_float(
-            existing_position.current_price
-        )
-    else:
-        current_value = 0.0
-
-    waiter_reserved = sum(
-        bond.at(o.price_percent).real_price * o.quantity
-        for o in bid_registry.bids_for(bond.figi)
-    )
-    allowed_budget = settings.TOTAL_MAX_SUM_PER_BOND - current_value - waiter_reserved
+    exposure = exposure_ledger.exposure(bond)
+    allowed_budget = settings.TOTAL_MAX_SUM_PER_BOND - exposure.total
 
     qty_by_shared_cap = 0
     if allowed_budget > 0:
@@ -112,7 +101,9 @@ def _compute_purchase_quantity(
     return qty
 
 
-async def process_ask_sniper(ctx: MarketContext, bond: EnrichedBond) -> None:
+async def process_ask_sniper(
+    ctx: MarketContext, bond: EnrichedBond, budget: CashBudget | None = None
+) -> None:
     if ctx.cooldown_registry.on_cooldown(
         PurchaseStrategy.ASK_SNIPER, bond.figi, settings.ASK_COOLDOWN_SECONDS
     ):
@@ -122,6 +113,7 @@ async def process_ask_sniper(ctx: MarketContext, bond: EnrichedBond) -> None:
         return
 
     ask = bond.ask
+    book = ctx.book_history.stats(bond.figi)
     log.info(
         "ask_evaluating",
         name=bond.name,
@@ -136,26 +128,81 @@ async def process_ask_sniper(ctx: MarketContext, bond: EnrichedBond) -> None:
         nominal=bond.nominal,
         coupons_sum=bond.coupons_sum,
         full_return=bond.full_return,
+        ticks_per_second=book.ticks_per_second if book else None,
+        seconds_since_change=book.seconds_since_change if book else None,
     )
 
-    balance = await fetch_account_balance_rub(ctx.client, ctx.account_id)
-    if not balance.available:
-        return
-
-    existing_bonds = await fetch_bond_positions(ctx.client, ctx.account_id)
-    existing_position = existing_bonds.get(bond.figi)
+    if budget is not None:
+        available = budget.available
+    else:
+        balance = await fetch_account_balance_rub(ctx.client, ctx.account_id)
+        if not balance.available:
+            return
+        available = balance.available
 
-    quantity_to_buy = _compute_purchase_quantity(
-        bond, balance.available, existing_position, ctx.bid_registry
-    )
+    await ctx.exposure.wait_settled()
+    quantity_to_buy = _compute_purchase_quantity(bond, available, ctx.exposure)
 
     if quantity_to_buy <= 0:
         return
 
-    buy_price = await buy_at_ask(ctx.client, ctx.account_id, bond, quantity_to_buy)
+    decided_at = mark_decision("ask_sniper", bond.top)
+    lag = stream_lag_s(decided_at)
+    if (
+        settings.STALE_BOOK_MAX_AGE_MS > 0
+        and lag is not None
+        and lag * 1000 > settings.STALE_BOOK_MAX_AGE_MS
+    ):
+        # a fill-or-kill against a book the stream is this far behind on will most
+        # likely be killed
+        ORDER_OUTCOMES.inc("ask_buy", "stale_book")
+        log.info(
+            "ask_skipped",
+            name=bond.name,
+            figi=bond.figi,
+            ticker=bond.ticker,
+            reason="stale_book",
+            stream_lag_ms=round(lag * 1000),
+            max_age_ms=settings.STALE_BOOK_MAX_AGE_MS,
+        )
+        return
+
+    # trading may have been halted while the balance was being fetched
+    if not bond.is_normal_trading:
+        ORDER_OUTCOMES.inc("ask_buy", "not_normal_trading")
+        log.info(
+            "ask_skipped",
+            name=bond.name,
+            figi=bond.figi,
+            ticker=bond.ticker,
+            reason="not_normal_trading",
+            trading_status=bond.trading_status,
+        )
+        return
+
+    # reserve the order against the per-bond cap in the same step as sizing it, so a
+    # bid decision on the same bond can't spend that headroom while the order is out
+    in_flight = ask.real_price * quantity_to_buy
+    ctx.exposure.add_in_flight(bond.figi, in_flight)
+    if budget is not None:
+        budget.spend(in_flight)
+    try:
+        mark_send("ask_sniper", bond.top, decided_at)
+        buy_price = await buy_at_ask(
+            ctx.client,
+            ctx.account_id,
+            bond,
+            quantity_to_buy,
+            ctx.rejection_registry,
+        )
+    finally:
+        ctx.exposure.release_in_flight(bond.figi, in_flight)
 
     if buy_price is None:
+        if budget is not None:
+            budget.refund(in_flight)
         return
+    ctx.exposure.add_held(bond.figi, ask.current_price * quantity_to_buy)
 
     # calculating total_buy_price using our commission here, instead of using commission
     # provided by response itself - because in response's commission is always 0,
@@ -4,34 +4,36 @@ import structlog
 from t_tech.invest.grpc.schemas import (
     OrderExecutionReportStatus,
     OrderStateStreamResponse,
-    PortfolioPosition,
 )
 
 from src.config import settings
+from src.log_setup import Lazy
 from src.market.api import (
     cancel_bid_order,
     fetch_account_balance_rub,
-    fetch_bond_positions,
     fetch_tmon_etf_price_at,
     place_bid_order,
     replace_bid_order,
 )
 from src.market.bid_order_registry import ActiveBidOrder
+from src.market.cash_budget import CashBudget
 from src.market.context import MarketContext
 from src.market.domain import EnrichedBond
+from src.market.latency import mark_decision, mark_send
 from src.market.messages import compose_bid_fill_notification
-from src.market.utils import to_float
+from src.market.utils import nano_to_float
+from src.metrics import ORDER_OUTCOMES
 from src.stats.models import PurchaseStrategy
 from src.telegram import notify
 
 log = structlog.get_logger(__name__)
 
 
-def _decide_target_price_percent(
+def _decide_target_price_nano(
     bond: EnrichedBond, our_order: ActiveBidOrder | None
-) -> float | None:
-    bid = bond.bid_price_percent
-    ask = bond.ask_price_percent
+) -> int | None:
+    bid = bond.bid_price_nano
+    ask = bond.ask_price_nano
 
     if bid <= 0:
         log.debug(
@@ -42,10 +44,10 @@ def _decide_target_price_percent(
             reason="no_bids",
         )
         return None
-    if our_order and our_order.price_percent >= bid:
-        return our_order.price_percent
+    if our_order and our_order.price_nano >= bid:
+        return our_order.price_nano
 
-    target = bid + bond.min_price_increment
+    target = bid + bond.min_price_increment_nano
 
     if ask > 0 and target >= ask:
         if bid < ask:
@@ -56,9 +58,9 @@ def _decide_target_price_percent(
             figi=bond.figi,
             ticker=bond.ticker,
             reason="locked_or_crossed_book",
-            target_price=target,
-            ask_price=bond.ask.current_price,
-            bid_price=bond.bid.current_price,
+            target_price=nano_to_float(target),
+            ask_price=Lazy(lambda: bond.ask.current_price),
+            bid_price=Lazy(lambda: bond.bid.current_price),
         )
         return None
     return target
@@ -68,29 +70,28 @@ def _compute_bid_quantity(
     bond: EnrichedBond,
     target_real_price: float,
     balance: float,
-    existing_position: PortfolioPosition | None,
     ctx: MarketContext,
 ) -> int:
-    qty_by_bid_cap = int(settings.BID_MAX_SUM_PER_BOND // target_real_price)
-
-    sniper_held_value = (
-        to_float(existing_position.quantity) * to_float(existing_position.current_price)
-        if existing_position
-        else 0.0
+    exposure = ctx.exposure.exposure(bond)
+    # a bid another evaluation of this bond is still sending counts against the cap, so
+    # the allocator and the bond loop can't both place a full one
+    qty_by_bid_cap = int(
+        max(0.0, settings.BID_MAX_SUM_PER_BOND - exposure.bid_in_flight)
+        // target_real_price
     )
     qty_by_shared_cap = int(
-        max(0.0, settings.TOTAL_MAX_SUM_PER_BOND - sniper_held_value)
+        max(0.0, settings.TOTAL_MAX_SUM_PER_BOND - exposure.held - exposure.in_flight)
         // target_real_price
     )
 
-    reserved_rub = sum(
-        bond.at(o.price_percent).real_price * o.quantity
-        for o in ctx.bid_registry.bids_for(bond.figi)
-    )
-    effective_balance = balance + reserved_rub
+    effective_balance = balance + exposure.bid_reserved
     qty_by_balance = int(effective_balance // target_real_price)
 
     qty = min(qty_by_bid_cap, qty_by_shared_cap, qty_by_balance)
+    if qty_by_balance < min(qty_by_bid_cap, qty_by_shared_cap):
+        ctx.balance_limited.mark(bond.figi)
+    else:
+        ctx.balance_limited.discard(bond.figi)
     if qty == 0:
         log.debug(
             "bid_quantity_skipped",
@@ -109,28 +110,75 @@ async def _place_or_replace_bid(
     ctx: MarketContext,
     bond: EnrichedBond,
     qty: int,
-    price_percent: float,
+    price_nano: int,
     old: ActiveBidOrder | None = None,
 ) -> None:
-    async with ctx.bid_registry_lock:
-        await _place_or_replace_bid_unlocked(ctx, bond, qty, price_percent, old)
+    decided_at = mark_decision("bid_waiter", bond.top)
+    # reserved before the first await, so in the same step the quantity was sized in:
+    # the ask sniper can't spend this headroom while the bid waits for the lock
+    in_flight = bond.real_price_at(price_nano) * qty
+    ctx.exposure.add_in_flight(bond.figi, in_flight, bid=True)
+    try:
+        await ctx.bid_registry_lock.acquire()
+    except BaseException:
+        ctx.exposure.release_in_flight(bond.figi, in_flight, bid=True)
+        raise
+    try:
+        await _place_or_replace_bid_unlocked(
+            ctx, bond, qty, price_nano, in_flight, old, decided_at
+        )
+    finally:
+        ctx.bid_registry_lock.release()
 
 
 async def _place_or_replace_bid_unlocked(
     ctx: MarketContext,
     bond: EnrichedBond,
     qty: int,
-    price_percent: float,
+    price_nano: int,
+    in_flight: float,
     old: ActiveBidOrder | None = None,
+    decided_at: float | None = None,
 ) -> None:
-    if old is None:
-        response = await place_bid_order(
-            ctx.client, ctx.account_id, bond, qty, price_percent
-        )
-    else:
-        response = await replace_bid_order(
-            ctx.client, ctx.account_id, bond, old.order_id, qty, price_percent
-        )
+    """Sends the order and releases the caller's `in_flight` reservation."""
+    try:
+        # trading may have been halted while this waited for the balance or the lock
+        if not bond.is_normal_trading:
+            ORDER_OUTCOMES.inc(
+                "bid_place" if old is None else "bid_replace", "not_normal_trading"
+            )
+            log.info(
+                "bid_skipped",
+                name=bond.name,
+                figi=bond.figi,
+                ticker=bond.ticker,
+                reason="not_normal_trading",
+                trading_status=bond.trading_status,
+            )
+            return
+        if decided_at is not None:
+            mark_send("bid_waiter", bond.top, decided_at)
+        if old is None:
+            response = await place_bid_order(
+                ctx.client,
+                ctx.account_id,
+                bond,
+                qty,
+                price_nano,
+                ctx.rejection_registry,
+            )
+        else:
+            response = await replace_bid_order(
+                ctx.client,
+                ctx.account_id,
+                bond,
+                old.order_id,
+                qty,
+                price_nano,
+                ctx.rejection_registry,
+            )
+    finally:
+        ctx.exposure.release_in_flight(bond.figi, in_flight, bid=True)
     if response is None:
         return
 
@@ -142,12 +190,12 @@ async def _place_or_replace_bid_unlocked(
             ActiveBidOrder(
                 order_id=response.order_id,
                 figi=bond.figi,
-                price_percent=price_percent,
+                price_nano=price_nano,
                 quantity=lots_left,
             )
         )
 
-    view = bond.at(price_percent)
+    view = bond.at(price_nano)
     if old is None:
         log.info(
             "bid_placed",
@@ -177,7 +225,7 @@ async def _place_or_replace_bid_unlocked(
         )
 
     if response.lots_executed > 0:
-        await _record_fill(ctx, bond, response.lots_executed, price_percent)
+        await _record_fill(ctx, bond, response.lots_executed, price_nano)
 
 
 async def _cancel_bid(
@@ -201,7 +249,9 @@ async def _cancel_bid_unlocked(
     )
 
 
-async def process_bid_waiter(ctx: MarketContext, bond: EnrichedBond) -> None:
+async def process_bid_waiter(
+    ctx: MarketContext, bond: EnrichedBond, budget: CashBudget | None = None
+) -> None:
     if bond.ticker in settings.BLACK_LISTED_TICKERS:
         return
 
@@ -216,17 +266,18 @@ async def process_bid_waiter(ctx: MarketContext, bond: EnrichedBond) -> None:
         )
     our_order = existing_bids[0] if existing_bids else None
 
-    target_price_percent = _decide_target_price_percent(bond, our_order)
-    if target_price_percent is None:
+    target_price_nano = _decide_target_price_nano(bond, our_order)
+    if target_price_nano is None:
         return
 
-    target_view = bond.at(target_price_percent)
+    target_view = bond.at(target_price_nano)
 
     if not (
         settings.BID_MIN_ANNUAL_YIELD
         <= target_view.annual_yield
         <= settings.BID_MAX_ANNUAL_YIELD
     ):
+        ctx.balance_limited.discard(bond.figi)
         if our_order:
             log.info(
                 "bid_yield_out_of_range",
@@ -252,19 +303,19 @@ async def process_bid_waiter(ctx: MarketContext, bond: EnrichedBond) -> None:
             )
         return
 
-    balance = await fetch_account_balance_rub(ctx.client, ctx.account_id)
-    if balance.available is None:
-        return
-
-    existing_positions = await fetch_bond_positions(ctx.client, ctx.account_id)
-    existing_position = existing_positions.get(bond.figi)
+    if budget is not None:
+        available = budget.available
+    else:
+        balance = await fetch_account_balance_rub(ctx.client, ctx.account_id)
+        if balance.available is None:
+            return
+        available = balance.available
 
     if target_view.real_price <= 0:
         return
 
-    target_qty = _compute_bid_quantity(
-        bond, target_view.real_price, balance.available, existing_position, ctx
-    )
+    await ctx.exposure.wait_settled()
+    target_qty = _compute_bid_quantity(bond, target_view.real_price, available, ctx)
 
     if target_qty == 0:
         if our_order:
@@ -290,11 +341,13 @@ async def process_bid_waiter(ctx: MarketContext, bond: EnrichedBond) -> None:
                 ticker=bond.ticker,
             )
             return
-        await _place_or_replace_bid(ctx, bond, target_qty, target_price_percent)
+        if budget is not None:
+            budget.spend(target_view.real_price * target_qty)
+        await _place_or_replace_bid(ctx, bond, target_qty, target_price_nano)
         return
 
     if (
-        our_order.price_percent == target_price_percent
+        our_order.price_nano == target_price_nano
         and our_order.quantity == target_qty
     ):
         log.debug(
@@ -307,15 +360,21 @@ async def process_bid_waiter(ctx: MarketContext, bond: EnrichedBond) -> None:
         )
         return
 
+    if budget is not None:
+        budget.spend(
+            target_view.real_price * target_qty
+            - bond.real_price_at(our_order.price_nano) * our_order.quantity
+        )
     await _place_or_replace_bid(
-        ctx, bond, target_qty, target_price_percent, old=our_order
+        ctx, bond, target_qty, target_price_nano, old=our_order
     )
 
 
 async def _record_fill(
-    ctx: MarketContext, bond: EnrichedBond, lots_filled: int, price_percent: float
+    ctx: MarketContext, bond: EnrichedBond, lots_filled: int, price_nano: int
 ) -> None:
-    view = bond.at(price_percent)
+    view = bond.at(price_nano)
+    ctx.exposure.add_held(bond.figi, view.current_price * lots_filled)
     total_price = view.real_price * lots_filled
     log.info(
         "bid_filled",
@@ -386,7 +445,7 @@ async def _process_bid_order_state_unlocked(
                 lots_filled=newly_filled,
             )
         else:
-            await _record_fill(ctx, bond, newly_filled, existing_order.price_percent)
+            await _record_fill(ctx, bond, newly_filled, existing_order.price_nano)
 
     status = event.execution_report_status
     if status in (
@@ -414,8 +473,3 @@ async def _process_bid_order_state_unlocked(
             order_id=event.order_id,
             lots_left=event.lots_left,
         )
-
-
-async def refresh_all_bids(ctx: MarketContext) -> None:
-    for bond in ctx.catalog.all():
-        await process_bid_waiter(ctx, bond)
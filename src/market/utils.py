@@ -1,11 +1,22 @@
 from t_tech.invest.grpc.schemas import MoneyValue, Quotation
 
+NANO = 1_000_000_000
+
 
 def to_float(money: MoneyValue | Quotation) -> float:
     return money.units + (money.nano / 1e9)
 
 
-def from_float(value: float) -> Quotation:
-    units = int(value)
-    nano = int(round((value - units) * 1e9))
-    return Quotation(units=units, nano=nano)
+def to_nano(money: MoneyValue | Quotation) -> int:
+    return money.units * NANO + money.nano
+
+
+def from_nano(value: int) -> Quotation:
+    # units and nano carry the same sign, so split the magnitude and re-apply it
+    units, nano = divmod(abs(value), NANO)
+    sign = -1 if value < 0 else 1
+    return Quotation(units=sign * units, nano=sign * nano)
+
+
+def nano_to_float(value: int) -> float:
+    return value / NANO
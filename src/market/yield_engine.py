@@ -0,0 +1,81 @@
+from collections.abc import Sequence
+from datetime import date
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from src.market.domain import EnrichedBond
+
+DAYS_IN_YEAR = 365.25
+
+_NEWTON_MAX_ITERATIONS = 50
+_NEWTON_TOLERANCE = 1e-10
+_MIN_RATE = -0.95
+
+
+def pad_cashflows(
+    flows: Sequence[tuple[Sequence[float], Sequence[float]]],
+) -> tuple[np.ndarray, np.ndarray]:
+    width = max((len(amounts) for amounts, _ in flows), default=0)
+    amounts = np.zeros((len(flows), width))
+    times = np.zeros((len(flows), width))
+    for i, (row_amounts, row_times) in enumerate(flows):
+        amounts[i, : len(row_amounts)] = row_amounts
+        times[i, : len(row_times)] = row_times
+    return amounts, times
+
+
+def solve_xirr(prices: np.ndarray, amounts: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """
+    Solves price = sum(amount / (1 + rate) ** time) for every row at once.
+
+    Rows are padded with zero amounts, which drop out of both the NPV and its
+    derivative. Returns the effective annual rate per row, NaN where it doesn't
+    converge or the inputs can't have a root.
+    """
+    prices = np.asarray(prices, dtype=float)
+    horizon = times.max(axis=1, initial=0.0)
+    valid = (prices > 0) & (horizon > 0)
+
+    # the simple annualized return is a close starting point for short bonds
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.where(valid, (amounts.sum(axis=1) / prices - 1) / horizon, 0.0)
+    rate = np.maximum(rate, _MIN_RATE)
+
+    converged = ~valid
+    with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+        for _ in range(_NEWTON_MAX_ITERATIONS):
+            discount = (1 + rate)[:, None] ** -times
+            npv = (amounts * discount).sum(axis=1) - prices
+            slope = -(times * amounts * discount).sum(axis=1) / (1 + rate)
+            step = np.where(converged | (slope == 0), 0.0, npv / slope)
+            rate = np.maximum(rate - step, _MIN_RATE)
+            converged |= np.abs(step) < _NEWTON_TOLERANCE
+            if converged.all():
+                break
+
+    return np.where(valid & converged & np.isfinite(rate), rate, np.nan)
+
+
+def xirr_yields(
+    bonds: Sequence["EnrichedBond"], real_prices: Sequence[float], on: date
+) -> np.ndarray:
+    amounts, times = pad_cashflows([bond.cashflows(on) for bond in bonds])
+    return np.nan_to_num(solve_xirr(np.asarray(real_prices), amounts, times)) * 100
+
+
+def warm_yields(bonds: Sequence["EnrichedBond"], on: date) -> None:
+    # solves the top-of-book ask and bid for the whole catalog in one batch, so the
+    # first ranking after a refresh doesn't run one solver per bond
+    quoted = [
+        (bond, real_price)
+        for bond in bonds
+        for price_nano in (bond.ask_price_nano, bond.bid_price_nano)
+        if price_nano > 0 and (real_price := bond.real_price_at(price_nano, on)) > 0
+    ]
+    if not quoted:
+        return
+    yields = xirr_yields([b for b, _ in quoted], [p for _, p in quoted], on)
+    for (bond, real_price), annual_yield in zip(quoted, yields):
+        bond.remember_yield(real_price, float(annual_yield), on)
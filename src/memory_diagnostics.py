@@ -0,0 +1,119 @@
+import asyncio
+import gc
+import signal
+import tracemalloc
+from collections import Counter
+from collections.abc import Callable, Mapping, Sized
+
+import structlog
+from aiohttp import web
+
+log = structlog.get_logger(__name__)
+
+_TOP_N = 15
+_TRACEMALLOC_FRAMES = 5
+
+
+def rss_bytes() -> int | None:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+class MemoryDiagnostics:
+    def __init__(self, registries: Mapping[str, Sized]) -> None:
+        self._registries = registries
+        self._previous: tracemalloc.Snapshot | None = None
+        self._reporting = asyncio.Lock()
+        self._signalled: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(_TRACEMALLOC_FRAMES)
+        self._previous = self._snapshot()
+
+    def registry_sizes(self) -> dict[str, int]:
+        return {name: len(registry) for name, registry in self._registries.items()}
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+
+    def _allocation_growth(self) -> list[dict]:
+        if not tracemalloc.is_tracing():
+            return []
+        current = self._snapshot()
+        previous, self._previous = self._previous, current
+        if previous is None:
+            return []
+        return [
+            {
+                "where": str(stat.traceback[0]),
+                "size_diff_kb": round(stat.size_diff / 1024, 1),
+                "count_diff": stat.count_diff,
+            }
+            for stat in current.compare_to(previous, "lineno")[:_TOP_N]
+        ]
+
+    @staticmethod
+    def _object_counts() -> dict[str, int]:
+        counts = Counter(type(o).__qualname__ for o in gc.get_objects())
+        return dict(counts.most_common(_TOP_N))
+
+    async def report(self) -> dict:
+        """
+        Walks every tracked object and diffs allocations against the previous report,
+        so this is for on-demand use only. The walk runs in a worker thread, but it
+        holds the GIL throughout, so the event loop still slows down while it runs.
+        """
+        registries = self.registry_sizes()
+        async with self._reporting:
+            objects, growth = await asyncio.to_thread(
+                lambda: (self._object_counts(), self._allocation_growth())
+            )
+        return {
+            "rss_bytes": rss_bytes(),
+            "registries": registries,
+            "objects": objects,
+            "allocation_growth": growth,
+        }
+
+    async def log_report(self) -> None:
+        log.info("memory_report", **await self.report())
+
+    def _on_signal(self) -> None:
+        if self._signalled is not None and not self._signalled.done():
+            log.info("memory_report_skipped", reason="already_running")
+            return
+        self._signalled = asyncio.get_running_loop().create_task(
+            self.log_report(), name="memory_report"
+        )
+
+    async def handle_http(self, _: web.Request) -> web.Response:
+        return web.json_response(await self.report())
+
+    def install(self) -> dict[str, Callable]:
+        """
+        Starts tracing allocations and hooks up `kill -USR2 <pid>`; returns the HTTP
+        routes to mount next to /metrics.
+        """
+        self.start()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGUSR2, self._on_signal)
+        return {"/debug/memory": self.handle_http}
+
+    async def log_periodically(self, interval_s: float) -> None:
+        while True:
+            await asyncio.sleep(interval_s)
+            rss = rss_bytes()
+            log.info(
+                "memory_usage",
+                rss_mb=round(rss / 2**20, 1) if rss is not None else None,
+                **self.registry_sizes(),
+            )
@@ -0,0 +1,291 @@
+import asyncio
+import math
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Awaitable, Callable, Iterator, Mapping
+from contextlib import contextmanager
+
+import structlog
+from aiohttp import web
+
+log = structlog.get_logger(__name__)
+
+type Handler = Callable[[web.Request], Awaitable[web.Response]]
+
+_LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+
+    @abstractmethod
+    def _lines(self) -> Iterator[str]: ...
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(f"{line}\n" for line in self._lines())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def _lines(self) -> Iterator[str]:
+        for labels, value in self._values.items():
+            yield (
+                f"{self.name}{_format_labels(self.labelnames, labels)} "
+                f"{_format_value(value)}"
+            )
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._functions: dict[tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def set_function(self, fn: Callable[[], float], *labels: str) -> None:
+        """
+        Reads the value from `fn` at scrape time instead of on every change.
+        """
+        self._functions[labels] = fn
+
+    def _lines(self) -> Iterator[str]:
+        values = dict(self._values)
+        for labels, fn in self._functions.items():
+            values[labels] = fn()
+        for labels, value in values.items():
+            yield (
+                f"{self.name}{_format_labels(self.labelnames, labels)} "
+                f"{_format_value(value)}"
+            )
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = _LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self._buckets = buckets
+        # per label set: one count per bucket plus +Inf, then the running sum
+        self._counts: dict[tuple[str, ...], list[int]] = {}
+        self._sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self._buckets) + 1)
+        counts[bisect_left(self._buckets, value)] += 1
+        self._sums[labels] = self._sums.get(labels, 0.0) + value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def _lines(self) -> Iterator[str]:
+        names = self.labelnames + ("le",)
+        for labels, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self._buckets + (math.inf,), counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket"
+                    f"{_format_labels(names, labels + (_format_value(bound),))} "
+                    f"{cumulative}"
+                )
+            suffix = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{suffix} {_format_value(self._sums[labels])}"
+            yield f"{self.name}_count{suffix} {cumulative}"
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register[M: _Metric](self, metric: M) -> M:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self._metrics.values())
+
+
+REGISTRY = MetricsRegistry()
+
+TICKS_RECEIVED = REGISTRY.register(
+    Counter(
+        "bond_ticks_received_total",
+        "Order-book messages received per bond.",
+        ("figi",),
+    )
+)
+TICKS_COALESCED = REGISTRY.register(
+    Counter(
+        "bond_ticks_coalesced_total",
+        "Order-book messages that left the quoted prices unchanged and were dropped.",
+        ("figi",),
+    )
+)
+STRATEGY_SECONDS = REGISTRY.register(
+    Histogram(
+        "strategy_evaluation_seconds",
+        "Time spent evaluating a strategy for one tick.",
+        ("strategy",),
+    )
+)
+RPC_SECONDS = REGISTRY.register(
+    Histogram("broker_rpc_seconds", "Broker unary RPC latency.", ("method",))
+)
+BOOK_RECEIVE_LAG_SECONDS = REGISTRY.register(
+    Histogram(
+        "book_receive_lag_seconds",
+        "Time from the exchange stamping an order book to this process receiving it.",
+    )
+)
+ORDER_LATENCY_SECONDS = REGISTRY.register(
+    Histogram(
+        "order_latency_seconds",
+        "Tick-to-order latency by strategy and stage.",
+        ("strategy", "stage"),
+    )
+)
+ORDER_OUTCOMES = REGISTRY.register(
+    Counter(
+        "order_outcomes_total",
+        "Order requests by operation and outcome (broker error code on failure).",
+        ("operation", "outcome"),
+    )
+)
+REGISTRY_SIZE = REGISTRY.register(
+    Gauge("registry_size", "Number of entries in an in-memory registry.", ("registry",))
+)
+LOOP_LAG_SECONDS = REGISTRY.register(
+    Histogram(
+        "event_loop_lag_seconds",
+        "How late the event loop resumed a sleeping task.",
+    )
+)
+SLOW_CALLBACKS = REGISTRY.register(
+    Counter(
+        "event_loop_slow_callbacks_total",
+        "Callbacks that ran longer than LOOP_SLOW_CALLBACK_MS (asyncio debug mode).",
+    )
+)
+PROCESS_RSS_BYTES = REGISTRY.register(
+    Gauge("process_resident_memory_bytes", "Resident set size of this process.")
+)
+LOOP_HEALTH = REGISTRY.register(
+    Gauge(
+        "loop_health",
+        "1 for the health state each session loop is currently in, 0 for the others.",
+        ("loop", "state"),
+    )
+)
+BROKER_CONNECTION_HEALTH = REGISTRY.register(
+    Gauge(
+        "broker_connection_health",
+        "1 for the health state the broker connection is in, 0 for the others.",
+        ("state",),
+    )
+)
+BROKER_PROBE_LATENCY_SECONDS = REGISTRY.register(
+    Gauge(
+        "broker_probe_latency_seconds",
+        "Round trip of the last successful broker connection health probe.",
+    )
+)
+LOOP_RESTARTS = REGISTRY.register(
+    Counter(
+        "loop_restarts_total",
+        "Times a session loop failed and was restarted.",
+        ("loop",),
+    )
+)
+
+
+async def _handle_metrics(_: web.Request) -> web.Response:
+    return web.Response(
+        text=REGISTRY.render(), content_type="text/plain", charset="utf-8"
+    )
+
+
+async def serve_metrics(
+    host: str,
+    port: int,
+    routes: Mapping[str, Handler] | None = None,
+) -> None:
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    for path, handler in (routes or {}).items():
+        app.router.add_get(path, handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+        log.info("metrics_server_started", host=host, port=port)
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
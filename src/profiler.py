@@ -0,0 +1,114 @@
+import asyncio
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from types import FrameType
+
+import structlog
+
+from src.config import settings
+
+log = structlog.get_logger(__name__)
+
+_SAMPLE_INTERVAL_S = 0.005
+_MAX_STACK_DEPTH = 128
+
+_running: asyncio.Task | None = None
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_qualname} ({filename}:{code.co_firstlineno})"
+
+
+def _fold(frame: FrameType | None) -> str:
+    labels = []
+    while frame is not None and len(labels) < _MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def _task_name(task: asyncio.Task | None) -> str:
+    if task is None:
+        return "idle"
+    name = task.get_name()
+    # tasks nobody named (gather fan-outs and the like) are lumped together
+    return "other" if name.startswith("Task-") else name
+
+
+def _sample(
+    loop: asyncio.AbstractEventLoop, thread_id: int, duration_s: float
+) -> tuple[Counter[str], Counter[str]]:
+    """
+    Runs on its own thread: periodically grabs the event-loop thread's Python stack
+    and the task the loop is currently stepping. A sample can only be taken once the
+    loop thread lets go of the GIL, so callbacks shorter than the interpreter's switch
+    interval are under-counted.
+    """
+    stacks: Counter[str] = Counter()
+    tasks: Counter[str] = Counter()
+    deadline = time.monotonic() + duration_s
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        task = _task_name(asyncio.current_task(loop))
+        tasks[task] += 1
+        stacks[f"{task};{_fold(frame)}"] += 1
+        time.sleep(_SAMPLE_INTERVAL_S)
+    return stacks, tasks
+
+
+def _write_folded(path: Path, stacks: Counter[str]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+async def run_profile(duration_s: float) -> None:
+    loop = asyncio.get_running_loop()
+    log.info("profile_started", duration_s=duration_s)
+    stacks, tasks = await asyncio.to_thread(
+        _sample, loop, threading.get_ident(), duration_s
+    )
+
+    stamp = datetime.now(tz=timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = settings.PROFILE_OUTPUT_DIR / f"profile-{stamp}.folded"
+    await asyncio.to_thread(_write_folded, path, stacks)
+
+    total = sum(tasks.values()) or 1
+    log.info(
+        "profile_finished",
+        path=str(path),
+        samples=total,
+        **{
+            f"share_{name}": round(count / total, 3)
+            for name, count in tasks.most_common()
+        },
+    )
+
+
+def start_profile() -> None:
+    global _running
+    if _running is not None and not _running.done():
+        log.info("profile_skipped", reason="already_running")
+        return
+    _running = asyncio.get_running_loop().create_task(
+        run_profile(settings.PROFILE_WINDOW_SECONDS), name="profiler"
+    )
+
+
+def install_profile_trigger() -> None:
+    """
+    `kill -USR1 <pid>` profiles the next PROFILE_WINDOW_SECONDS; PROFILE_AT_STARTUP
+    profiles the first window right away.
+    """
+    asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, start_profile)
+    if settings.PROFILE_AT_STARTUP:
+        start_profile()
@@ -1,4 +1,5 @@
 from .repositories import MaturityRepository, PurchaseRepository
-from .services import generate_report
 
-__all__ = ["PurchaseRepository", "MaturityRepository", "generate_report"]
+# the reporting stack (pandas, matplotlib) lives in `src.stats.services` and is only
+# imported by report.py, so the trading process never loads it
+__all__ = ["PurchaseRepository", "MaturityRepository"]
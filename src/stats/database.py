@@ -1,7 +1,10 @@
-from sqlalchemy import create_engine
+import time
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from src.config import settings
+from src.tracing import record_span
 
 engine = create_engine(
     settings.DATABASE_URL,
@@ -9,3 +12,15 @@ engine = create_engine(
 )
 
 SessionLocal = sessionmaker(bind=engine)
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _start_statement_span(conn, cursor, statement, parameters, context, executemany):
+    conn.info["statement_started_ns"] = time.time_ns()
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _finish_statement_span(conn, cursor, statement, parameters, context, executemany):
+    started_ns = conn.info.pop("statement_started_ns", None)
+    if started_ns is not None:
+        record_span("db.query", started_ns, time.time_ns(), statement=statement[:200])
@@ -1,25 +1,35 @@
-from . import calculators, plotters, printers
-from .repositories import MaturityRepository, PurchaseRepository
+from collections.abc import Callable
+
+import pandas as pd
 
+from . import calculators, printers
+from .repositories import MaturityRepository, PurchaseRepository
 
 _REPORTS = {
-    "purchase": (
-        lambda df: df,
-        printers.print_per_purchase,
-        plotters.plot_per_purchase,
-    ),
-    "month": (calculators.per_month, printers.print_per_month, plotters.plot_per_month),
-    "bond": (calculators.per_bond, printers.print_per_bond, plotters.plot_per_bond),
+    "purchase": (lambda df: df, printers.print_per_purchase),
+    "month": (calculators.per_month, printers.print_per_month),
+    "bond": (calculators.per_bond, printers.print_per_bond),
 }
 
 
+def _plotters() -> dict[str, Callable[[pd.DataFrame], None]]:
+    # imported here so matplotlib is only loaded for --plot
+    from .plotters import plot_per_bond, plot_per_month, plot_per_purchase
+
+    return {
+        "purchase": plot_per_purchase,
+        "month": plot_per_month,
+        "bond": plot_per_bond,
+    }
+
+
 def generate_report(group: str, plot: bool) -> None:
     df = calculators.per_purchase(
         PurchaseRepository().get_all(),
         MaturityRepository().get_all(),
     )
-    transform, printer, plotter = _REPORTS[group]
+    transform, printer = _REPORTS[group]
     data = transform(df)
     printer(data)
     if plot:
-        plotter(data)
+        _plotters()[group](data)
@@ -0,0 +1,116 @@
+import atexit
+import json
+import random
+import secrets
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import TextIO
+
+from src.config import settings
+
+
+@dataclass(frozen=True, slots=True)
+class _SpanContext:
+    trace_id: str
+    span_id: str
+
+
+# marks a trace whose root lost the sampling roll, so its children don't re-roll
+_UNSAMPLED = _SpanContext(trace_id="", span_id="")
+
+_current: ContextVar[_SpanContext | None] = ContextVar("trace_span", default=None)
+_out: TextIO | None = None
+_sample_rate = 0.0
+
+
+def setup_tracing() -> None:
+    """
+    Spans are written one JSON object per line, with OTLP field names, to
+    TRACE_EXPORT_PATH or stdout; they can be replayed into any OTLP collector.
+    """
+    global _out, _sample_rate
+    if not settings.TRACING_ENABLED:
+        return
+    if settings.TRACE_EXPORT_PATH is None:
+        _out = sys.stdout
+    else:
+        settings.TRACE_EXPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+        _out = open(settings.TRACE_EXPORT_PATH, "a", buffering=1 << 16)
+        atexit.register(_out.close)
+    _sample_rate = settings.TRACE_SAMPLE_RATE
+
+
+def _export(
+    ctx: _SpanContext,
+    parent: _SpanContext | None,
+    name: str,
+    start_ns: int,
+    end_ns: int,
+    attributes: dict,
+    error: BaseException | None = None,
+) -> None:
+    record = {
+        "traceId": ctx.trace_id,
+        "spanId": ctx.span_id,
+        "parentSpanId": parent.span_id if parent else "",
+        "name": name,
+        "startTimeUnixNano": start_ns,
+        "endTimeUnixNano": end_ns,
+        "attributes": attributes,
+        "status": (
+            {"code": "ERROR", "message": repr(error)} if error else {"code": "OK"}
+        ),
+    }
+    _out.write(json.dumps(record, separators=(",", ":"), default=str) + "\n")
+
+
+def _child_context() -> tuple[_SpanContext | None, _SpanContext | None]:
+    """
+    Returns the (parent, new span) pair for a span opened here. The new span is None
+    when nothing should be recorded: tracing is off or the trace wasn't sampled.
+    """
+    parent = _current.get()
+    if _out is None or parent is _UNSAMPLED:
+        return parent, None
+    if parent is None:
+        if random.random() >= _sample_rate:
+            return None, _UNSAMPLED
+        return None, _SpanContext(secrets.token_hex(16), secrets.token_hex(8))
+    return parent, _SpanContext(parent.trace_id, secrets.token_hex(8))
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[None]:
+    parent, ctx = _child_context()
+    if ctx is None:
+        yield
+        return
+
+    token = _current.set(ctx)
+    start_ns = time.time_ns()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current.reset(token)
+        if ctx is not _UNSAMPLED:
+            _export(ctx, parent, name, start_ns, time.time_ns(), attributes, error)
+
+
+def record_span(name: str, start_ns: int, end_ns: int, **attributes) -> None:
+    """
+    Records an already finished span under the current one, for work timed by hooks
+    rather than wrapped in a block.
+    """
+    parent = _current.get()
+    if _out is None or parent is None or parent is _UNSAMPLED:
+        return
+    ctx = _SpanContext(parent.trace_id, secrets.token_hex(8))
+    _export(ctx, parent, name, start_ns, end_ns, attributes)